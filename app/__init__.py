@@ -1,6 +1,11 @@
 from flask import Flask
 from .config import Config
 from .extensions import db, migrate, jwt, mail
+from .helpers.geoip import geoip_cli
+from .helpers.progress_counters import progress_cli
+from .helpers.course_analytics import stats_cli
+from .helpers.comment_reactions import comments_cli
+from .utils.cache import init_cache
 from .routes import auth, student, admin, courses, enrollments, progress, comments, payment, coupon, lessons, s3_direct_upload
 from flask_cors import CORS
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -38,6 +43,7 @@ def create_app():
     app.config['MAIL_DEFAULT_SENDER'] = app.config.get('MAIL_DEFAULT_SENDER')
     
     mail.init_app(app)
+    init_cache(app)
     
     # Verify mail is initialized
     with app.app_context():
@@ -57,4 +63,10 @@ def create_app():
     app.register_blueprint(lessons.bp, url_prefix='/lessons')
     app.register_blueprint(s3_direct_upload.bp, url_prefix='/upload')
 
+    # CLI commands
+    app.cli.add_command(geoip_cli)
+    app.cli.add_command(progress_cli)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(comments_cli)
+
     return app
\ No newline at end of file
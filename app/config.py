@@ -34,4 +34,34 @@ class Config:
     # Payment Gateways
     PAYSTACK_SECRET_KEY = os.getenv("PAYSTACK_SECRET_KEY")
     PAYSTACK_PUBLIC_KEY = os.getenv("PAYSTACK_PUBLIC_KEY")
-    PAYSTACK_BASE_URL = os.getenv("PAYSTACK_BASE_URL", "https://api.paystack.co")
\ No newline at end of file
+    PAYSTACK_BASE_URL = os.getenv("PAYSTACK_BASE_URL", "https://api.paystack.co")
+
+    # Offline GeoIP database built with `flask geoip import` (falls back to ipwho.is when unset)
+    GEOIP_DB_PATH = os.getenv("GEOIP_DB_PATH")
+
+    # Optional SQLite file so all workers on a host share cached lookups
+    CACHE_SHARED_PATH = os.getenv("CACHE_SHARED_PATH")
+
+    # Seconds a worker trusts its cached versions before re-checking the database
+    CACHE_VERSION_CHECK_INTERVAL = int(os.getenv("CACHE_VERSION_CHECK_INTERVAL", 5))
+
+    # Read lesson completion from the per-course bitmaps instead of Progress rows
+    # (run `flask progress migrate-bitmaps` before enabling)
+    PROGRESS_BITMAP_READS = os.getenv("PROGRESS_BITMAP_READS", "False").lower() in ("true", "1", "yes")
+
+
+    # Playback position heartbeats are buffered per worker and flushed in batches
+    POSITION_FLUSH_INTERVAL = int(os.getenv("POSITION_FLUSH_INTERVAL", 10))
+    POSITION_BUFFER_MAX_KEYS = int(os.getenv("POSITION_BUFFER_MAX_KEYS", 50000))
+
+    # Course analytics snapshots older than this (seconds) are reported as stale;
+    # schedule `flask stats refresh` more often than this
+    COURSE_STATS_MAX_AGE = int(os.getenv("COURSE_STATS_MAX_AGE", 3600))
+
+    # Live comment streams (SSE). "memory" fans events out within one worker;
+    # "database" writes them to comment_events and every worker polls that table
+    COMMENT_EVENTS_BACKEND = os.getenv("COMMENT_EVENTS_BACKEND", "memory")
+    COMMENT_EVENTS_POLL_INTERVAL = float(os.getenv("COMMENT_EVENTS_POLL_INTERVAL", 1))
+    COMMENT_EVENTS_RETENTION_HOURS = int(os.getenv("COMMENT_EVENTS_RETENTION_HOURS", 24))
+    COMMENT_STREAM_HEARTBEAT = int(os.getenv("COMMENT_STREAM_HEARTBEAT", 15))
+    COMMENT_STREAM_MAX_SECONDS = int(os.getenv("COMMENT_STREAM_MAX_SECONDS", 300))
@@ -0,0 +1,70 @@
+"""
+Cross-worker cache versions
+Every cached structure is tied to a named counter in the cache_versions table.
+Writers bump the counter after committing; readers re-check it at most once
+every CACHE_VERSION_CHECK_INTERVAL seconds, so other workers see changes within
+that window without a query per request.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models.cache import CacheVersion
+
+# name -> (version, checked_at)
+_known = {}
+_lock = threading.Lock()
+
+
+def _check_interval():
+    return current_app.config.get("CACHE_VERSION_CHECK_INTERVAL", 5)
+
+
+def current_version(name):
+    """Latest known version for name (0 if it was never bumped)"""
+    now = time.monotonic()
+    entry = _known.get(name)
+    if entry is not None and now - entry[1] < _check_interval():
+        return entry[0]
+
+    version = db.session.query(CacheVersion.version).filter_by(name=name).scalar() or 0
+    with _lock:
+        _known[name] = (version, now)
+    return version
+
+
+def _increment(names):
+    now = datetime.utcnow()
+    for name in names:
+        updated = CacheVersion.query.filter_by(name=name).update(
+            {CacheVersion.version: CacheVersion.version + 1, CacheVersion.updated_at: now},
+            synchronize_session=False
+        )
+        if not updated:
+            db.session.add(CacheVersion(name=name, version=1, updated_at=now))
+    db.session.commit()
+
+
+def bump_versions(*names):
+    """
+    Increment the given versions and commit. Call after the data change itself
+    has been committed.
+    """
+    if not names:
+        return
+
+    try:
+        _increment(names)
+    except IntegrityError:
+        # another worker created the row first - retry as a plain update
+        db.session.rollback()
+        _increment(names)
+
+    with _lock:
+        for name in names:
+            _known.pop(name, None)
@@ -0,0 +1,78 @@
+"""
+Public course catalog snapshots
+GET /courses/ serves a pre-serialized payload per currency. A snapshot is only
+rebuilt when the catalog version (course authoring) or, for USD, the exchange
+rate version changes.
+"""
+
+import hashlib
+import threading
+
+from flask import current_app
+
+from app.models import Course
+from app.helpers.cache_versions import current_version, bump_versions
+from app.helpers.currency import convert_ngn_to_usd, EXCHANGE_RATE_VERSION
+from app.helpers.course_stats import lesson_totals_for
+
+CATALOG_VERSION = "catalog"
+
+# currency -> {"versions": tuple, "body": bytes, "etag": str}
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def _snapshot_versions(currency):
+    rate_version = current_version(EXCHANGE_RATE_VERSION) if currency == "USD" else None
+    return current_version(CATALOG_VERSION), rate_version
+
+
+def _build_catalog(currency):
+    courses = Course.query.filter_by(is_published=True).all()
+    totals = lesson_totals_for(courses)
+    result = []
+    for c in courses:
+        if currency == "USD":
+            price = convert_ngn_to_usd(c.price)
+        else:
+            price = c.price
+
+        result.append({
+            "id": c.id,
+            "image": c.image,
+            "slug": c.slug,
+            "title": c.title,
+            "description": c.description,
+            "price": price,
+            "currency": currency,
+            "is_published": c.is_published,
+            "total_lessons": totals[c.id][0],
+            "total_duration": totals[c.id][1],
+            "created_at": c.created_at.isoformat()
+        })
+    return current_app.json.dumps(result).encode("utf-8")
+
+
+def get_catalog_snapshot(currency):
+    """Return {"body": bytes, "etag": str} for the published catalog in currency"""
+    versions = _snapshot_versions(currency)
+    snapshot = _snapshots.get(currency)
+    if snapshot is not None and snapshot["versions"] == versions:
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshots.get(currency)
+        if snapshot is None or snapshot["versions"] != versions:
+            body = _build_catalog(currency)
+            snapshot = {
+                "versions": versions,
+                "body": body,
+                "etag": hashlib.sha256(body).hexdigest()
+            }
+            _snapshots[currency] = snapshot
+    return snapshot
+
+
+def invalidate_catalog():
+    """Call after committing a change that affects the public course list"""
+    bump_versions(CATALOG_VERSION)
@@ -0,0 +1,298 @@
+"""
+Live comment events
+Comment writes publish an event (created / updated / deleted / reacted) that
+is pushed to every open `GET /comments/stream/<lesson_id>` connection as
+Server-Sent Events, so lesson pages don't have to poll list_comments.
+
+Two backends, picked with COMMENT_EVENTS_BACKEND:
+- memory: events are fanned out inside the publishing worker only. Fine for
+  a single worker; with several, a viewer only hears about writes handled by
+  the worker holding their stream.
+- database: events are written to comment_events; one thread per worker
+  polls that table every COMMENT_EVENTS_POLL_INTERVAL seconds and fans new
+  rows out locally, so every worker sees every write.
+
+Event ids only ever increase, so a reconnecting EventSource resumes from its
+Last-Event-ID. When the events a client missed are gone (evicted from the
+memory replay buffer or pruned from the table), the stream sends a `reset`
+event and the client reloads the thread instead.
+
+With the database backend ids can become visible out of order (a lower id
+committing after a higher one), so the poller re-reads the last POLL_LOOKBACK
+ids each time and fans out the late ones it hadn't seen.
+"""
+
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.extensions import db
+from app.models.comment import CommentEvent
+
+REPLAY_PER_LESSON = 200  # memory backend: recent events kept per lesson for resume
+SUBSCRIBER_QUEUE_SIZE = 500
+POLL_BATCH = 500
+POLL_LOOKBACK = 100  # trailing ids re-polled for late commits
+PRUNE_EVERY = 600  # seconds between pruning old comment_events rows
+
+
+class _Subscriber:
+    def __init__(self, lesson_id):
+        self.lesson_id = lesson_id
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+
+class CommentEventBroker:
+    """In-process fan-out of comment events to stream subscribers"""
+
+    def __init__(self):
+        self._subscribers = {}  # lesson_id -> set of _Subscriber
+        self._recent = {}  # lesson_id -> deque of events (memory backend)
+        self._evicted_up_to = {}  # lesson_id -> newest event id dropped from _recent
+        # ids keep increasing across restarts, so old Last-Event-IDs stay comparable
+        self._first_id = int(time.time() * 1000)
+        self._ids = itertools.count(self._first_id)
+        self._lock = threading.Lock()
+        self._poller = None
+        self._pid = None
+        self._app = None
+        self._last_polled = None
+        self._polled_ids = set()  # ids fanned out within the lookback window
+
+    # --------------------------------------------------------------
+    # Subscribers
+    # --------------------------------------------------------------
+    def subscribe(self, app, lesson_id):
+        if app.config.get("COMMENT_EVENTS_BACKEND") == "database":
+            self._ensure_poller(app)
+
+        subscriber = _Subscriber(lesson_id)
+        with self._lock:
+            self._subscribers.setdefault(lesson_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.lesson_id)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.lesson_id]
+
+    def subscriber_count(self):
+        return sum(len(s) for s in self._subscribers.values())
+
+    def _fanout(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(event["lesson_id"], ()))
+
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(event)
+            except queue.Full:
+                # slow client: its stream ends with a reset and it reloads
+                subscriber.overflowed = True
+
+    # --------------------------------------------------------------
+    # Publishing
+    # --------------------------------------------------------------
+    def publish(self, lesson_id, kind, payload):
+        """Publish a comment event; call after the change itself was committed"""
+        if current_app.config.get("COMMENT_EVENTS_BACKEND") == "database":
+            try:
+                db.session.add(CommentEvent(lesson_id=lesson_id, kind=kind, payload=payload))
+                db.session.commit()
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                print(f"⚠️ Could not record comment event: {e}")
+            return
+
+        event = {
+            "id": next(self._ids),
+            "lesson_id": lesson_id,
+            "kind": kind,
+            "payload": payload
+        }
+        with self._lock:
+            recent = self._recent.setdefault(lesson_id, deque())
+            recent.append(event)
+            if len(recent) > REPLAY_PER_LESSON:
+                self._evicted_up_to[lesson_id] = recent.popleft()["id"]
+        self._fanout(event)
+
+    # --------------------------------------------------------------
+    # Resume
+    # --------------------------------------------------------------
+    def events_since(self, lesson_id, last_id):
+        """
+        (events after last_id, complete) for a reconnecting client. complete is
+        False when some of the events it missed are no longer available.
+        """
+        if current_app.config.get("COMMENT_EVENTS_BACKEND") == "database":
+            oldest = db.session.query(func.min(CommentEvent.id)).scalar()
+            rows = (
+                CommentEvent.query
+                .filter(CommentEvent.lesson_id == lesson_id, CommentEvent.id > last_id)
+                .order_by(CommentEvent.id)
+                .limit(REPLAY_PER_LESSON + 1)
+                .all()
+            )
+            complete = (oldest is None or oldest <= last_id + 1) and len(rows) <= REPLAY_PER_LESSON
+            return [_row_event(row) for row in rows[:REPLAY_PER_LESSON]], complete
+
+        with self._lock:
+            events = [e for e in self._recent.get(lesson_id, ()) if e["id"] > last_id]
+            # events from before this process started are gone too
+            complete = max(self._evicted_up_to.get(lesson_id, 0), self._first_id - 1) <= last_id
+        return events, complete
+
+    # --------------------------------------------------------------
+    # Database backend poller
+    # --------------------------------------------------------------
+    def _ensure_poller(self, app):
+        # threads don't survive a fork: start one per worker process
+        if self._poller is not None and self._pid == os.getpid() and self._poller.is_alive():
+            return
+
+        with self._lock:
+            if self._poller is not None and self._pid == os.getpid() and self._poller.is_alive():
+                return
+            self._app = app
+            self._pid = os.getpid()
+            # only rows written from now on; older ones are replayed via events_since
+            self._last_polled = db.session.query(func.max(CommentEvent.id)).scalar() or 0
+            self._polled_ids = {
+                row_id for (row_id,) in
+                db.session.query(CommentEvent.id).filter(CommentEvent.id > self._last_polled - POLL_LOOKBACK)
+            }
+            self._poller = threading.Thread(target=self._run, name="comment-events", daemon=True)
+            self._poller.start()
+
+    def poll_once(self):
+        """Fan out rows added since the last poll; needs an app context"""
+        rows = (
+            CommentEvent.query
+            .filter(CommentEvent.id > self._last_polled - POLL_LOOKBACK)
+            .order_by(CommentEvent.id)
+            .limit(POLL_LOOKBACK + POLL_BATCH)
+            .all()
+        )
+        fanned = 0
+        for row in rows:
+            if row.id in self._polled_ids:
+                continue
+            self._polled_ids.add(row.id)
+            self._last_polled = max(self._last_polled, row.id)
+            self._fanout(_row_event(row))
+            fanned += 1
+
+        floor = self._last_polled - POLL_LOOKBACK
+        self._polled_ids = {row_id for row_id in self._polled_ids if row_id > floor}
+        return fanned
+
+    def prune(self):
+        hours = self._app.config.get("COMMENT_EVENTS_RETENTION_HOURS", 24)
+        cutoff = datetime.utcnow() - timedelta(hours=hours)
+        CommentEvent.query.filter(CommentEvent.created_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+
+    def _run(self):
+        last_prune = 0
+        while True:
+            time.sleep(self._app.config.get("COMMENT_EVENTS_POLL_INTERVAL", 1))
+            with self._app.app_context():
+                try:
+                    self.poll_once()
+                    if time.monotonic() - last_prune > PRUNE_EVERY:
+                        self.prune()
+                        last_prune = time.monotonic()
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    print(f"⚠️ Comment event poll failed: {e}")
+                finally:
+                    db.session.remove()
+
+
+def _row_event(row):
+    return {"id": row.id, "lesson_id": row.lesson_id, "kind": row.kind, "payload": row.payload}
+
+
+def _format(event, with_id=True):
+    event_id = f"id: {event['id']}\n" if with_id else ""
+    return f"{event_id}event: {event['kind']}\ndata: {json.dumps(event['payload'])}\n\n"
+
+
+def stream_events(app, lesson_id, last_id=None):
+    """
+    Generator of SSE text for a lesson: missed events first (when resuming),
+    then live events, with a comment line every COMMENT_STREAM_HEARTBEAT
+    seconds. The stream closes after COMMENT_STREAM_MAX_SECONDS so a worker is
+    never held forever; EventSource reconnects with its Last-Event-ID.
+    """
+    heartbeat = app.config.get("COMMENT_STREAM_HEARTBEAT", 15)
+    deadline = time.monotonic() + app.config.get("COMMENT_STREAM_MAX_SECONDS", 300)
+
+    # subscribe before replaying so nothing published in between is missed
+    subscriber = comment_events.subscribe(app, lesson_id)
+    try:
+        yield "retry: 3000\n\n"
+
+        sent = last_id or 0
+        delivered = set()
+        if last_id is not None:
+            missed, complete = comment_events.events_since(lesson_id, last_id)
+            if not complete:
+                yield "event: reset\ndata: {}\n\n"
+                return
+            for event in missed:
+                sent = event["id"]
+                delivered.add(sent)
+                yield _format(event)
+
+        # don't hold a database connection while the stream idles
+        db.session.remove()
+
+        while time.monotonic() < deadline:
+            if subscriber.overflowed:
+                yield "event: reset\ndata: {}\n\n"
+                return
+
+            try:
+                event = subscriber.queue.get(timeout=min(heartbeat, max(deadline - time.monotonic(), 0.1)))
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+                continue
+
+            if event["id"] in delivered:
+                continue
+            delivered.add(event["id"])
+            if len(delivered) > 2 * POLL_LOOKBACK:
+                delivered = {i for i in delivered if i > sent - POLL_LOOKBACK}
+
+            if event["id"] > sent:
+                sent = event["id"]
+                yield _format(event)
+            else:
+                # committed late (database backend): no id line, so the
+                # client's Last-Event-ID stays on the newest event
+                yield _format(event, with_id=False)
+    finally:
+        comment_events.unsubscribe(subscriber)
+
+
+# One broker per worker process
+comment_events = CommentEventBroker()
+
+
+def publish_comment_event(lesson_id, kind, payload):
+    comment_events.publish(lesson_id, kind, payload)
@@ -0,0 +1,179 @@
+"""
+Comment reactions
+Each user's reaction is a CommentReaction row (unique per user and comment),
+and the totals shown on a comment live in CommentReactionCount. Counters are
+only changed with `count = count + 1` style UPDATEs, so concurrent reactions
+never overwrite each other the way rewriting the old JSON blobs did.
+
+Reads are batched for a whole page: one query for the counts and one for the
+current user's own reactions.
+
+All writes run inside the caller's transaction; the caller commits.
+"""
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import Comment, User
+from app.models.comment import CommentReaction, CommentReactionCount
+
+MAX_REACTION_LENGTH = 32
+
+
+def _bump(comment_id, reaction, delta):
+    """Atomically add delta to one counter, creating the row on first use"""
+    query = CommentReactionCount.query.filter_by(comment_id=comment_id, type=reaction)
+    if delta < 0:
+        query = query.filter(CommentReactionCount.count > 0)
+
+    updated = query.update(
+        {CommentReactionCount.count: CommentReactionCount.count + delta},
+        synchronize_session=False
+    )
+    if updated or delta < 0:
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(CommentReactionCount(comment_id=comment_id, type=reaction, count=delta))
+    except IntegrityError:
+        # another request created the counter first
+        query.update(
+            {CommentReactionCount.count: CommentReactionCount.count + delta},
+            synchronize_session=False
+        )
+
+
+def set_reaction(user_id, comment_id, reaction):
+    """
+    Give a user's reaction to a comment, replacing any previous one.
+    Returns False when the user already had exactly this reaction.
+    """
+    # at most one retry: a concurrent request from the same user changed the row
+    for _ in range(2):
+        current = (
+            db.session.query(CommentReaction.type)
+            .filter_by(user_id=user_id, comment_id=comment_id)
+            .scalar()
+        )
+        if current == reaction:
+            return False
+
+        if current is None:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(CommentReaction(user_id=user_id, comment_id=comment_id, type=reaction))
+            except IntegrityError:
+                continue
+        else:
+            moved = (
+                CommentReaction.query
+                .filter_by(user_id=user_id, comment_id=comment_id, type=current)
+                .update({CommentReaction.type: reaction}, synchronize_session=False)
+            )
+            if not moved:
+                continue
+            _bump(comment_id, current, -1)
+
+        _bump(comment_id, reaction, 1)
+        return True
+
+    return False
+
+
+def remove_user_reactions(user_id):
+    """
+    Delete all of a user's reactions and take them off the counters (e.g.
+    before deleting the account). Returns the ids of the comments affected.
+    """
+    rows = (
+        db.session.query(CommentReaction.comment_id, CommentReaction.type)
+        .filter(CommentReaction.user_id == int(user_id))
+        .all()
+    )
+    for comment_id, reaction in rows:
+        _bump(comment_id, reaction, -1)
+
+    db.session.execute(
+        delete(CommentReaction)
+        .where(CommentReaction.user_id == int(user_id))
+        .execution_options(synchronize_session=False)
+    )
+    return [comment_id for comment_id, _ in rows]
+
+
+def reaction_counts(comment_ids):
+    """{comment_id: {reaction: count}} for many comments in one query"""
+    if not comment_ids:
+        return {}
+
+    rows = (
+        db.session.query(CommentReactionCount.comment_id, CommentReactionCount.type, CommentReactionCount.count)
+        .filter(CommentReactionCount.comment_id.in_(comment_ids), CommentReactionCount.count > 0)
+        .all()
+    )
+    counts = {}
+    for comment_id, reaction, count in rows:
+        counts.setdefault(comment_id, {})[reaction] = count
+    return counts
+
+
+def user_reaction_map(user_id, comment_ids):
+    """{comment_id: reaction} for the comments a user reacted to, in one query"""
+    if not user_id or not comment_ids:
+        return {}
+
+    return dict(
+        db.session.query(CommentReaction.comment_id, CommentReaction.type)
+        .filter(CommentReaction.user_id == int(user_id), CommentReaction.comment_id.in_(comment_ids))
+        .all()
+    )
+
+
+def rebuild_reaction_counts():
+    """Recount every counter from CommentReaction rows with one INSERT ... SELECT"""
+    db.session.execute(delete(CommentReactionCount))
+    db.session.execute(
+        insert(CommentReactionCount).from_select(
+            ["comment_id", "type", "count"],
+            select(CommentReaction.comment_id, CommentReaction.type, func.count(CommentReaction.id))
+            .group_by(CommentReaction.comment_id, CommentReaction.type)
+        )
+    )
+
+
+comments_cli = AppGroup("comments", help="Maintain comment reactions.")
+
+
+@comments_cli.command("migrate-reactions")
+@click.option("--counts-only", is_flag=True, help="Only recount counters from existing reaction rows")
+def migrate_reactions_command(counts_only):
+    """Copy the legacy Comment.user_reactions JSON into CommentReaction rows."""
+    if not counts_only:
+        user_ids = {row[0] for row in db.session.query(User.id)}
+
+        db.session.execute(delete(CommentReaction))
+        rows = []
+        legacy = (
+            db.session.query(Comment.id, Comment.user_reactions)
+            .filter(Comment.user_reactions.isnot(None))
+            .execution_options(yield_per=1000)
+        )
+        for comment_id, user_reactions in legacy:
+            for user_id, reaction in (user_reactions or {}).items():
+                if not str(user_id).isdigit() or int(user_id) not in user_ids:
+                    continue
+                if not isinstance(reaction, str) or not reaction or len(reaction) > MAX_REACTION_LENGTH:
+                    continue
+                rows.append({"user_id": int(user_id), "comment_id": comment_id, "type": reaction})
+
+        for start in range(0, len(rows), 1000):
+            db.session.execute(insert(CommentReaction), rows[start:start + 1000])
+        click.echo(f"✅ Copied {len(rows)} reactions")
+
+    rebuild_reaction_counts()
+    db.session.commit()
+    click.echo("✅ Rebuilt reaction counters")
@@ -0,0 +1,220 @@
+"""
+Comment threads
+Threads are served a page at a time: top-level comments are keyset-paginated
+on (created_at, id), newest first. Each comment carries its direct
+reply_count and a preview of its first few replies, and deeper replies are
+fetched lazily through the replies endpoint, oldest first.
+
+A page is built with a fixed number of queries however large the thread is:
+  1. the page of comments
+  2. reply previews for the whole page (ROW_NUMBER() per parent)
+  3. reply counts for the page and its previews (one GROUP BY)
+  4. every author involved
+  5. reaction counts
+
+Lesson pages are read far more often than comments are written, so built
+pages are cached per lesson under the `comments:{lesson_id}` cache version.
+Every comment write bumps that version (invalidate_lesson_comments). The
+cached part is the same for every viewer; the viewer's own reactions
+(reactedByUser) are overlaid per request with one small query.
+"""
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import load_only
+
+from app.extensions import db
+from app.models import Comment, User
+from app.helpers.cache_versions import bump_versions, current_version
+from app.helpers.pagination import encode_cursor, keyset_filter
+from app.helpers.comment_reactions import reaction_counts, user_reaction_map
+from app.utils.cache import TTLCache
+
+DEFAULT_PREVIEW = 3
+MAX_PREVIEW = 10
+
+# (kind, lesson_id, parent_id, cursor, limit, preview) -> {"version": int, "page": dict}
+_page_cache = TTLCache("comment_pages", maxsize=2048, ttl=600)
+
+_COLUMNS = load_only(
+    Comment.id, Comment.content, Comment.user_id, Comment.lesson_id,
+    Comment.parent_id, Comment.created_at
+)
+
+
+def author_map(user_ids):
+    """{user_id: (full_name, role, profile_photo)} for many users in one query"""
+    if not user_ids:
+        return {}
+
+    rows = (
+        db.session.query(User.id, User.full_name, User.role, User.profile_photo)
+        .filter(User.id.in_(set(user_ids)))
+        .all()
+    )
+    return {user_id: (full_name, role, photo) for user_id, full_name, role, photo in rows}
+
+
+def serialize_node(c, authors, reactions=None):
+    """
+    One comment without its replies. authors comes from author_map(),
+    reactions from reaction_counts(); reactedByUser is filled in per viewer
+    by overlay_viewer_reactions().
+    """
+    full_name, role, photo = authors.get(c.user_id, ("Unknown", None, None))
+
+    return {
+        "id": c.id,
+        "lesson_id": c.lesson_id,
+        "parent_id": c.parent_id,
+        "author": full_name,
+        "role": role,
+        "avatar": photo,
+        "text": c.content,
+        "timestamp": c.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        "reactions": reactions or {},
+        "reactedByUser": {},
+        "reply_count": 0,
+        "replies": []
+    }
+
+
+def overlay_viewer_reactions(nodes, current_user_id):
+    """
+    Copies of serialized comments (and their reply previews) with reactedByUser
+    set for the viewer. Never mutates the input, which may be cached.
+    """
+    if not current_user_id or not nodes:
+        return nodes
+
+    comment_ids = [n["id"] for n in nodes] + [r["id"] for n in nodes for r in n["replies"]]
+    own = user_reaction_map(current_user_id, comment_ids)
+
+    def overlay(node):
+        mine = own.get(node["id"])
+        return {**node, "reactedByUser": {k: k == mine for k in node["reactions"]}}
+
+    return [{**overlay(n), "replies": [overlay(r) for r in n["replies"]]} for n in nodes]
+
+
+def _reply_counts(parent_ids):
+    if not parent_ids:
+        return {}
+
+    return dict(
+        db.session.query(Comment.parent_id, func.count(Comment.id))
+        .filter(Comment.parent_id.in_(parent_ids))
+        .group_by(Comment.parent_id)
+        .all()
+    )
+
+
+def _reply_previews(parent_ids, per_parent):
+    """{parent_id: [first `per_parent` replies, oldest first]} in one windowed query"""
+    if not parent_ids or per_parent <= 0:
+        return {}
+
+    rank = func.row_number().over(
+        partition_by=Comment.parent_id,
+        order_by=(Comment.created_at.asc(), Comment.id.asc())
+    ).label("rank")
+    ranked = select(Comment.id, rank).where(Comment.parent_id.in_(parent_ids)).subquery()
+
+    replies = (
+        Comment.query
+        .options(_COLUMNS)
+        .join(ranked, ranked.c.id == Comment.id)
+        .filter(ranked.c.rank <= per_parent)
+        .order_by(Comment.parent_id, Comment.created_at.asc(), Comment.id.asc())
+        .all()
+    )
+
+    previews = {}
+    for reply in replies:
+        previews.setdefault(reply.parent_id, []).append(reply)
+    return previews
+
+
+def serialize_comments(comments, preview=DEFAULT_PREVIEW):
+    """Comments with reply_count and their first `preview` replies attached"""
+    previews = _reply_previews([c.id for c in comments], preview)
+    preview_rows = [reply for replies in previews.values() for reply in replies]
+    comment_ids = [c.id for c in comments] + [r.id for r in preview_rows]
+    counts = _reply_counts(comment_ids)
+    authors = author_map([c.user_id for c in comments] + [r.user_id for r in preview_rows])
+    reactions = reaction_counts(comment_ids)
+
+    def node(c):
+        data = serialize_node(c, authors, reactions.get(c.id))
+        data["reply_count"] = counts.get(c.id, 0)
+        return data
+
+    result = []
+    for c in comments:
+        data = node(c)
+        data["replies"] = [node(reply) for reply in previews.get(c.id, [])]
+        result.append(data)
+    return result
+
+
+def _build_page(query, cursor, limit, descending, preview):
+    if cursor:
+        query = query.filter(keyset_filter(Comment.created_at, Comment.id, cursor, descending=descending))
+
+    if descending:
+        query = query.order_by(Comment.created_at.desc(), Comment.id.desc())
+    else:
+        query = query.order_by(Comment.created_at.asc(), Comment.id.asc())
+
+    rows = query.options(_COLUMNS).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        "comments": serialize_comments(rows, preview),
+        "has_more": has_more,
+        "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    }
+
+
+def comments_version_key(lesson_id):
+    return f"comments:{lesson_id}"
+
+
+def invalidate_lesson_comments(*lesson_ids):
+    """Call after committing any change to these lessons' comments or reactions"""
+    bump_versions(*(comments_version_key(lesson_id) for lesson_id in set(lesson_ids)))
+
+
+def _cached_page(key, lesson_id, build, current_user_id):
+    version = current_version(comments_version_key(lesson_id))
+
+    cached = _page_cache.get(key)
+    if cached is not None and cached["version"] == version:
+        page = cached["page"]
+    else:
+        page = build()
+        _page_cache.set(key, {"version": version, "page": page})
+
+    return {**page, "comments": overlay_viewer_reactions(page["comments"], current_user_id)}
+
+
+def lesson_comment_page(lesson_id, cursor=None, limit=20, preview=DEFAULT_PREVIEW, current_user_id=None):
+    """One page of a lesson's top-level comments, newest first"""
+    query = Comment.query.filter(Comment.lesson_id == lesson_id, Comment.parent_id.is_(None))
+    return _cached_page(
+        ("lesson", lesson_id, None, cursor, limit, preview),
+        lesson_id,
+        lambda: _build_page(query, cursor, limit, True, preview),
+        current_user_id
+    )
+
+
+def reply_page(lesson_id, comment_id, cursor=None, limit=20, preview=DEFAULT_PREVIEW, current_user_id=None):
+    """One page of a comment's direct replies, oldest first"""
+    query = Comment.query.filter(Comment.parent_id == comment_id)
+    return _cached_page(
+        ("replies", lesson_id, comment_id, cursor, limit, preview),
+        lesson_id,
+        lambda: _build_page(query, cursor, limit, False, preview),
+        current_user_id
+    )
@@ -0,0 +1,283 @@
+"""
+Lesson completion bitmaps
+Compact alternative to one Progress row per (user, lesson): each (user, course)
+gets a single LessonCompletionBitmap row. Every lesson owns a stable
+Lesson.bit_index within its course, so completion is one bit, and the
+completion time is one packed uint32 slot.
+
+Deleted lessons leave their bit behind; counts are always taken against the
+mask of lessons that still exist, so stale bits never show up.
+
+Writes happen alongside the Progress writes (record_lesson_states). Reads only
+switch to the bitmaps when PROGRESS_BITMAP_READS is enabled.
+
+Course.next_lesson_bit is NULL for courses created before bitmaps existed,
+until `flask progress migrate-bitmaps` assigns their lessons' bits. Courses
+created since start at 0, i.e. already migrated; the migration handles both.
+"""
+
+import calendar
+import struct
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import Course, Lesson, Progress
+from app.models.course import Section
+from app.models.progress import LessonCompletionBitmap
+from app.helpers.course_outline import get_course_outline, get_lesson_course_id
+
+TIME_SLOT = struct.Struct(">I")
+
+
+def _epoch(at):
+    return calendar.timegm(at.utctimetuple())
+
+
+def _from_epoch(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+
+def _set_slot(bitmap, times, index, at):
+    """Set (at is a datetime) or clear (at is None) one lesson in the buffers"""
+    byte, bit = divmod(index, 8)
+    if len(bitmap) <= byte:
+        bitmap.extend(b"\0" * (byte + 1 - len(bitmap)))
+    if len(times) < (index + 1) * TIME_SLOT.size:
+        times.extend(b"\0" * ((index + 1) * TIME_SLOT.size - len(times)))
+
+    if at is not None:
+        bitmap[byte] |= 1 << bit
+        TIME_SLOT.pack_into(times, index * TIME_SLOT.size, _epoch(at))
+    else:
+        bitmap[byte] &= ~(1 << bit) & 0xFF
+        TIME_SLOT.pack_into(times, index * TIME_SLOT.size, 0)
+
+
+def lesson_mask(outline):
+    """Integer with a bit set for every live lesson in an outline"""
+    mask = 0
+    for lesson in outline["lessons"].values():
+        if lesson.get("bit_index") is not None:
+            mask |= 1 << lesson["bit_index"]
+    return mask
+
+
+def count_completed(bitmap, mask):
+    """Completed live lessons (popcount of bitmap & mask)"""
+    return bin(int.from_bytes(bitmap or b"", "little") & mask).count("1")
+
+
+# ---------------------------------------------------------------
+# Writes
+# ---------------------------------------------------------------
+def allocate_bit_index(course_id):
+    """
+    Next bit index for a new lesson in the course, or None when the course has
+    not been migrated yet. Call inside the transaction that creates the lesson.
+    """
+    updated = (
+        Course.query
+        .filter(Course.id == course_id, Course.next_lesson_bit.isnot(None))
+        .update({Course.next_lesson_bit: Course.next_lesson_bit + 1}, synchronize_session=False)
+    )
+    if not updated:
+        return None
+    return db.session.query(Course.next_lesson_bit).filter_by(id=course_id).scalar() - 1
+
+
+def _locked_row(user_id, course_id):
+    row = (
+        LessonCompletionBitmap.query
+        .filter_by(user_id=user_id, course_id=course_id)
+        .with_for_update()
+        .first()
+    )
+    if row is not None:
+        return row
+
+    row = LessonCompletionBitmap(user_id=user_id, course_id=course_id, bitmap=b"", completed_times=b"")
+    try:
+        with db.session.begin_nested():
+            db.session.add(row)
+    except IntegrityError:
+        # created concurrently - use theirs
+        row = (
+            LessonCompletionBitmap.query
+            .filter_by(user_id=user_id, course_id=course_id)
+            .with_for_update()
+            .first()
+        )
+    return row
+
+
+def record_lesson_states(user_id, states):
+    """
+    Mirror completion changes into the bitmaps (does not commit)
+
+    Args:
+        states: {lesson_id: completed_at datetime, or None when uncompleted}
+    """
+    by_course = {}
+    missing = []
+    for lesson_id, at in states.items():
+        course_id = get_lesson_course_id(lesson_id)
+        outline = get_course_outline(course_id) if course_id else None
+        lesson = outline["lessons"].get(lesson_id) if outline else None
+        if lesson is None or lesson.get("bit_index") is None:
+            missing.append(lesson_id)
+            continue
+        by_course.setdefault(course_id, {})[lesson["bit_index"]] = at
+
+    if missing:
+        # the cached outline may predate a just-added lesson: ask the database
+        rows = (
+            db.session.query(Lesson.id, Lesson.bit_index, Section.course_id)
+            .join(Section, Section.id == Lesson.section_id)
+            .filter(Lesson.id.in_(missing), Lesson.bit_index.isnot(None))
+            .all()
+        )
+        # lessons still without a bit belong to courses not migrated yet;
+        # migrate-bitmaps rebuilds those from Progress
+        for lesson_id, bit_index, course_id in rows:
+            by_course.setdefault(course_id, {})[bit_index] = states[lesson_id]
+
+    for course_id, changes in by_course.items():
+        row = _locked_row(user_id, course_id)
+        bitmap = bytearray(row.bitmap or b"")
+        times = bytearray(row.completed_times or b"")
+        for index, at in changes.items():
+            _set_slot(bitmap, times, index, at)
+        row.bitmap = bytes(bitmap)
+        row.completed_times = bytes(times)
+
+
+# ---------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------
+def _load_row(user_id, course_id):
+    return (
+        db.session.query(LessonCompletionBitmap.bitmap, LessonCompletionBitmap.completed_times)
+        .filter_by(user_id=user_id, course_id=course_id)
+        .first()
+    )
+
+
+def bitmap_completion_map(user_id, course_id, outline):
+    """{lesson_id: completed_at} decoded from the user's bitmap for a course"""
+    row = _load_row(user_id, course_id)
+    if row is None:
+        return {}
+
+    bits = int.from_bytes(row.bitmap or b"", "little")
+    times = row.completed_times or b""
+    completions = {}
+    for lesson_id, lesson in outline["lessons"].items():
+        index = lesson.get("bit_index")
+        if index is None or not (bits >> index) & 1:
+            continue
+        offset = index * TIME_SLOT.size
+        seconds = TIME_SLOT.unpack_from(times, offset)[0] if len(times) >= offset + TIME_SLOT.size else 0
+        completions[lesson_id] = _from_epoch(seconds) if seconds else None
+    return completions
+
+
+def bitmap_progress(user_id, course_id):
+    """Completed / total / percentage for a course straight from the bitmap"""
+    outline = get_course_outline(course_id)
+    if outline is None:
+        return {"completed_lessons": 0, "total_lessons": 0, "overall_percentage": 0}
+
+    mask = lesson_mask(outline)
+    total = bin(mask).count("1")
+    row = _load_row(user_id, course_id)
+    completed = count_completed(row.bitmap, mask) if row else 0
+
+    return {
+        "completed_lessons": completed,
+        "total_lessons": total,
+        "overall_percentage": round((completed / total) * 100, 2) if total > 0 else 0
+    }
+
+
+def bitmap_counts_for(user_id, course_ids):
+    """{course_id: completed lesson count} for many courses from one bitmap query"""
+    rows = (
+        db.session.query(LessonCompletionBitmap.course_id, LessonCompletionBitmap.bitmap)
+        .filter(
+            LessonCompletionBitmap.user_id == user_id,
+            LessonCompletionBitmap.course_id.in_(course_ids)
+        )
+        .all()
+    )
+
+    counts = {}
+    for course_id, bitmap in rows:
+        outline = get_course_outline(course_id)
+        if outline is not None:
+            counts[course_id] = count_completed(bitmap, lesson_mask(outline))
+    return counts
+
+
+# ---------------------------------------------------------------
+# Migration from Progress rows
+# ---------------------------------------------------------------
+def migrate_course_bitmaps(course_id):
+    """
+    Give every lesson of a course a bit index and rebuild all of its bitmaps
+    from Progress rows (does not commit). Returns the number of bitmaps written.
+    """
+    course = Course.query.get(course_id)
+    if course is None:
+        return 0
+
+    lessons = (
+        Lesson.query
+        .join(Section, Section.id == Lesson.section_id)
+        .filter(Section.course_id == course_id)
+        .order_by(Section.id, Lesson.id)
+        .all()
+    )
+
+    next_bit = max(
+        [course.next_lesson_bit or 0] + [lesson.bit_index + 1 for lesson in lessons if lesson.bit_index is not None]
+    )
+    for lesson in lessons:
+        if lesson.bit_index is None:
+            lesson.bit_index = next_bit
+            next_bit += 1
+    course.next_lesson_bit = next_bit
+
+    bit_of = {lesson.id: lesson.bit_index for lesson in lessons}
+    rows = (
+        db.session.query(Progress.user_id, Progress.lesson_id, func.coalesce(Progress.completed_at, Progress.updated_at))
+        .filter(Progress.lesson_id.in_(list(bit_of)), Progress.is_completed.is_(True))
+        .all()
+    ) if bit_of else []
+
+    buffers = {}
+    for user_id, lesson_id, at in rows:
+        bitmap, times = buffers.setdefault(user_id, (bytearray(), bytearray()))
+        _set_slot(bitmap, times, bit_of[lesson_id], at or datetime.utcnow())
+
+    db.session.execute(
+        delete(LessonCompletionBitmap)
+        .where(LessonCompletionBitmap.course_id == course_id)
+        .execution_options(synchronize_session=False)
+    )
+    if buffers:
+        now = datetime.utcnow()
+        db.session.execute(insert(LessonCompletionBitmap), [
+            {
+                "user_id": user_id,
+                "course_id": course_id,
+                "bitmap": bytes(bitmap),
+                "completed_times": bytes(times),
+                "updated_at": now
+            }
+            for user_id, (bitmap, times) in buffers.items()
+        ])
+
+    return len(buffers)
@@ -0,0 +1,227 @@
+"""
+Course completion analytics
+Per-course and per-lesson funnel numbers are computed with grouped queries
+and stored in snapshot tables, so dashboards read a handful of rows instead
+of scanning Progress/Enrollment on every view. Snapshots are only refreshed
+by `flask stats refresh` (cron); views never recompute them, they just flag
+a snapshot older than COURSE_STATS_MAX_AGE as stale.
+
+The cohort is a course's active enrollments. Medians are taken in Python from
+a streamed two-column query, since MySQL and SQLite lack percentile functions.
+"""
+
+import statistics
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import and_, case, delete, distinct, func, insert, select, union_all
+
+from app.extensions import db
+from app.models import Course, Enrollment, Lesson, Progress
+from app.models.analytics import CourseStatsSnapshot, LessonStatsSnapshot
+from app.models.course import Section
+from app.models.progress import LessonPosition
+
+COHORT_STATUS = "active"
+
+
+def _hours(start, end):
+    if start is None or end is None:
+        return None
+    return max((end - start).total_seconds(), 0) / 3600
+
+
+def _median(values):
+    return round(statistics.median(values), 2) if values else None
+
+
+def _rate(count, total):
+    return round((count / total) * 100, 2) if total > 0 else 0.0
+
+
+def refresh_course_stats(course_id, now=None):
+    """Recompute the snapshot rows for one course (caller commits)"""
+    now = now or datetime.utcnow()
+
+    lesson_ids = [
+        row[0] for row in
+        db.session.query(Lesson.id)
+        .join(Section, Section.id == Lesson.section_id)
+        .filter(Section.course_id == course_id)
+        .order_by(Section.id, Lesson.id)
+    ]
+    course_lessons = select(Lesson.id).join(Section, Section.id == Lesson.section_id).where(
+        Section.course_id == course_id
+    )
+
+    enrolled = (
+        db.session.query(func.count(Enrollment.id))
+        .filter(Enrollment.course_id == course_id, Enrollment.status == COHORT_STATUS)
+        .scalar()
+    ) or 0
+
+    # completions by students in the cohort
+    cohort_join = and_(
+        Enrollment.user_id == Progress.user_id,
+        Enrollment.course_id == course_id,
+        Enrollment.status == COHORT_STATUS
+    )
+    completed_filter = (Progress.lesson_id.in_(course_lessons), Progress.is_completed.is_(True))
+
+    lesson_counts = dict(
+        db.session.query(Progress.lesson_id, func.count(distinct(Progress.user_id)))
+        .join(Enrollment, cohort_join)
+        .filter(*completed_filter)
+        .group_by(Progress.lesson_id)
+        .all()
+    )
+
+    # per-student totals: who finished, and how long it took
+    completed_count = 0
+    finishers_hours = []
+    per_student = (
+        db.session.query(
+            func.count(distinct(Progress.lesson_id)),
+            func.min(Enrollment.enrolled_at),
+            func.max(Progress.completed_at)
+        )
+        .join(Enrollment, cohort_join)
+        .filter(*completed_filter)
+        .group_by(Progress.user_id)
+    )
+    for done, enrolled_at, last_completed in per_student:
+        if lesson_ids and done >= len(lesson_ids):
+            completed_count += 1
+            hours = _hours(enrolled_at, last_completed)
+            if hours is not None:
+                finishers_hours.append(hours)
+
+    # time from enrollment to completion, streamed one lesson at a time
+    lesson_hours = {}
+    durations = (
+        db.session.query(Progress.lesson_id, Enrollment.enrolled_at, Progress.completed_at)
+        .join(Enrollment, cohort_join)
+        .filter(*completed_filter, Progress.completed_at.isnot(None))
+        .order_by(Progress.lesson_id)
+        .execution_options(yield_per=1000)
+    )
+    current_lesson, values = None, []
+    for lesson_id, enrolled_at, completed_at in durations:
+        if lesson_id != current_lesson:
+            if current_lesson is not None:
+                lesson_hours[current_lesson] = _median(values)
+            current_lesson, values = lesson_id, []
+        hours = _hours(enrolled_at, completed_at)
+        if hours is not None:
+            values.append(hours)
+    if current_lesson is not None:
+        lesson_hours[current_lesson] = _median(values)
+
+    # learners active recently: completions or playback heartbeats
+    cutoff_7d = now - timedelta(days=7)
+    cutoff_30d = now - timedelta(days=30)
+    activity = union_all(
+        select(
+            Progress.user_id.label("user_id"),
+            func.coalesce(Progress.updated_at, Progress.completed_at).label("at")
+        ).where(Progress.lesson_id.in_(course_lessons)),
+        select(
+            LessonPosition.user_id.label("user_id"),
+            LessonPosition.updated_at.label("at")
+        ).where(LessonPosition.lesson_id.in_(course_lessons))
+    ).subquery()
+    active_7d, active_30d = (
+        db.session.query(
+            func.count(distinct(case((activity.c.at >= cutoff_7d, activity.c.user_id)))),
+            func.count(distinct(activity.c.user_id))
+        )
+        .filter(activity.c.at >= cutoff_30d)
+        .one()
+    )
+
+    db.session.execute(
+        delete(LessonStatsSnapshot)
+        .where(LessonStatsSnapshot.course_id == course_id)
+        .execution_options(synchronize_session=False)
+    )
+    if lesson_ids:
+        db.session.execute(insert(LessonStatsSnapshot), [
+            {
+                "lesson_id": lesson_id,
+                "course_id": course_id,
+                "position": position,
+                "completed_count": lesson_counts.get(lesson_id, 0),
+                "completion_rate": _rate(lesson_counts.get(lesson_id, 0), enrolled),
+                "median_hours_to_complete": lesson_hours.get(lesson_id),
+                "refreshed_at": now
+            }
+            for position, lesson_id in enumerate(lesson_ids, start=1)
+        ])
+
+    db.session.merge(CourseStatsSnapshot(
+        course_id=course_id,
+        enrolled_count=enrolled,
+        completed_count=completed_count,
+        completion_rate=_rate(completed_count, enrolled),
+        median_hours_to_complete=_median(finishers_hours),
+        active_7d=active_7d or 0,
+        active_30d=active_30d or 0,
+        refreshed_at=now
+    ))
+
+
+def get_course_stats(course_id):
+    """Snapshot as a dict ({"course": ..., "lessons": [...]}) or None if never refreshed"""
+    snapshot = db.session.get(CourseStatsSnapshot, course_id)
+    if snapshot is None:
+        return None
+
+    lessons = (
+        LessonStatsSnapshot.query
+        .filter_by(course_id=course_id)
+        .order_by(LessonStatsSnapshot.position)
+        .all()
+    )
+
+    return {
+        "course": {
+            "course_id": snapshot.course_id,
+            "enrolled_count": snapshot.enrolled_count,
+            "completed_count": snapshot.completed_count,
+            "completion_rate": snapshot.completion_rate,
+            "median_hours_to_complete": snapshot.median_hours_to_complete,
+            "active_7d": snapshot.active_7d,
+            "active_30d": snapshot.active_30d,
+            "refreshed_at": snapshot.refreshed_at.isoformat() if snapshot.refreshed_at else None
+        },
+        "lessons": [
+            {
+                "lesson_id": lesson.lesson_id,
+                "position": lesson.position,
+                "completed_count": lesson.completed_count,
+                "completion_rate": lesson.completion_rate,
+                "median_hours_to_complete": lesson.median_hours_to_complete
+            }
+            for lesson in lessons
+        ]
+    }
+
+
+stats_cli = AppGroup("stats", help="Refresh course analytics snapshots.")
+
+
+@stats_cli.command("refresh")
+@click.option("--course-id", type=int, help="Only refresh this course")
+def refresh_command(course_id):
+    """Recompute completion statistics for every course."""
+    if course_id:
+        course_ids = [course_id]
+    else:
+        course_ids = [row[0] for row in db.session.query(Course.id).order_by(Course.id)]
+
+    for cid in course_ids:
+        refresh_course_stats(cid)
+        db.session.commit()
+
+    click.echo(f"✅ Refreshed stats for {len(course_ids)} courses")
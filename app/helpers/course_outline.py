@@ -0,0 +1,189 @@
+"""
+Cached course outlines
+The section -> lesson -> quiz structure of a course is built once with eager
+loading and cached per worker under the course's outline version. Requests
+overlay user-specific fields (access, media URLs, completion) on top of it.
+
+Cached outlines are shared between requests: treat them as read-only and copy
+before adding per-user fields.
+"""
+
+import os
+
+from sqlalchemy.orm import selectinload
+
+from app.extensions import db
+from app.models import Course, Lesson
+from app.models.course import Section
+from app.helpers.cache_versions import current_version, bump_versions
+from app.helpers.catalog import CATALOG_VERSION
+from app.utils.cache import TTLCache
+from app.utils.formatting import format_duration, format_size
+from app.utils.s3_helper import generate_presigned_url
+
+# course_id -> {"version": int, "outline": dict}
+_outline_cache = TTLCache("course_outline", maxsize=256, ttl=3600)
+
+# lesson_id -> course_id (lessons never move between courses)
+_lesson_course_cache = TTLCache("lesson_course", maxsize=10000, ttl=3600)
+
+
+def outline_version_key(course_id):
+    return f"outline:{course_id}"
+
+
+def _serialize_quiz(quiz):
+    return {
+        "id": quiz.id,
+        "question": quiz.question,
+        "options": quiz.options,
+        "correct_answer": quiz.correct_answer,
+        "quiz_type": quiz.quiz_type,
+        "explanation": quiz.explanation
+    }
+
+
+def _build_outline(course_id):
+    course = (
+        Course.query
+        .options(
+            selectinload(Course.sections)
+            .selectinload(Section.lessons)
+            .selectinload(Lesson.quizzes)
+        )
+        .filter_by(id=course_id)
+        .first()
+    )
+    if not course:
+        return None
+
+    sections = []
+    lessons = {}
+    total_lessons = 0
+    total_duration = 0.0
+
+    for section in course.sections:
+        section_lessons = []
+        for lesson in section.lessons:
+            entry = {
+                "id": lesson.id,
+                "title": lesson.title,
+                "slug": lesson.slug,
+                "notes": lesson.notes,
+                "reference_link": lesson.reference_link,
+                "duration": lesson.duration,
+                "size": lesson.size,
+                "duration_display": format_duration(lesson.duration),
+                "size_display": format_size(lesson.size),
+                "created_at": lesson.created_at.isoformat(),
+                "section_id": section.id,
+                "section_name": section.name,
+                "bit_index": lesson.bit_index,
+                "quizzes": [_serialize_quiz(q) for q in lesson.quizzes],
+                # raw media fields, only exposed through lesson_media()
+                "media": {
+                    "video_url": lesson.video_url,
+                    "document_url": lesson.document_url,
+                    "s3_video_key": lesson.s3_video_key,
+                    "s3_document_key": lesson.s3_document_key,
+                    "hls_key": lesson.hls_key,
+                    "transcode_status": lesson.transcode_status
+                }
+            }
+            section_lessons.append(entry)
+            lessons[lesson.id] = entry
+            total_lessons += 1
+            total_duration += lesson.duration or 0
+
+        sections.append({
+            "id": section.id,
+            "name": section.name,
+            "slug": section.slug,
+            "description": section.description,
+            "lessons": section_lessons
+        })
+
+    return {
+        "course": {
+            "id": course.id,
+            "title": course.title,
+            "slug": course.slug,
+            "description": course.description,
+            "long_description": course.long_description,
+            "price": course.price,
+            "is_published": course.is_published,
+            "total_lessons": total_lessons,
+            "total_duration": total_duration,
+            "created_at": course.created_at.isoformat(),
+            "image": course.image
+        },
+        "sections": sections,
+        "lessons": lessons
+    }
+
+
+def get_course_outline(course_id):
+    """Cached outline for a course, or None if the course doesn't exist"""
+    version = current_version(outline_version_key(course_id))
+
+    cached = _outline_cache.get(course_id)
+    if cached is not None and cached["version"] == version:
+        return cached["outline"]
+
+    outline = _build_outline(course_id)
+    if outline is not None:
+        _outline_cache.set(course_id, {"version": version, "outline": outline})
+    return outline
+
+
+def get_lesson_course_id(lesson_id):
+    """Course id a lesson belongs to, or None if the lesson doesn't exist"""
+    course_id = _lesson_course_cache.get(lesson_id)
+    if course_id is None:
+        course_id = (
+            db.session.query(Section.course_id)
+            .join(Lesson, Lesson.section_id == Section.id)
+            .filter(Lesson.id == lesson_id)
+            .scalar()
+        )
+        if course_id is not None:
+            _lesson_course_cache.set(lesson_id, course_id)
+    return course_id
+
+
+def lesson_media(entry, has_access, expiration=7200):
+    """Video/document URLs for an outline lesson entry (None without access)"""
+    if not has_access:
+        return {"video_url": None, "document_url": None}
+
+    media = entry["media"]
+    data = {}
+
+    if media["hls_key"] and media["transcode_status"] == "complete":
+        # Serve HLS playlist via CloudFront (no presigned needed if CF is configured)
+        data["video_url"] = f"https://{os.getenv('CLOUDFRONT_DOMAIN')}/{media['hls_key']}"
+        data["video_type"] = "application/x-mpegURL"  # Tell frontend it's HLS
+    elif media["s3_video_key"]:
+        # Fallback to raw video while transcoding or if HLS failed
+        data["video_url"] = generate_presigned_url(media["s3_video_key"], expiration=expiration)
+        data["video_type"] = "video/mp4"
+    else:
+        data["video_url"] = None
+
+    if media["s3_document_key"]:
+        data["document_url"] = generate_presigned_url(media["s3_document_key"], expiration=expiration)
+    else:
+        data["document_url"] = media["document_url"]
+
+    return data
+
+
+def invalidate_course_outline(course_id, catalog=False):
+    """
+    Call after committing an authoring change to a course. Pass catalog=True
+    when the change also affects the public course list.
+    """
+    names = [outline_version_key(course_id)]
+    if catalog:
+        names.append(CATALOG_VERSION)
+    bump_versions(*names)
@@ -0,0 +1,198 @@
+"""
+Course progress
+A student's completions for a course are fetched in one query as
+{lesson_id: completed_at}; section and overall percentages are then computed
+in memory against the cached course outline.
+"""
+
+from flask import current_app
+from sqlalchemy import distinct, func, insert, update
+
+from app.extensions import db
+from app.models import Lesson, Progress
+from app.models.course import Section
+from app.helpers.progress_counters import rebuild_counters
+from app.helpers.course_outline import get_course_outline
+from app.helpers.completion_bitmap import bitmap_completion_map, bitmap_counts_for, record_lesson_states
+
+
+def completion_map(user_id, course_id):
+    """{lesson_id: completed_at} for the lessons a user completed in a course"""
+    if current_app.config.get("PROGRESS_BITMAP_READS"):
+        outline = get_course_outline(course_id)
+        return bitmap_completion_map(user_id, course_id, outline) if outline else {}
+
+    rows = (
+        db.session.query(Progress.lesson_id, Progress.completed_at)
+        .join(Lesson, Lesson.id == Progress.lesson_id)
+        .join(Section, Section.id == Lesson.section_id)
+        .filter(
+            Progress.user_id == user_id,
+            Progress.is_completed.is_(True),
+            Section.course_id == course_id
+        )
+        .all()
+    )
+    return {lesson_id: completed_at for lesson_id, completed_at in rows}
+
+
+def completed_counts_for(user_id, course_ids):
+    """{course_id: completed lesson count} for a user across many courses in one query"""
+    if not course_ids:
+        return {}
+
+    if current_app.config.get("PROGRESS_BITMAP_READS"):
+        return bitmap_counts_for(user_id, course_ids)
+
+    rows = (
+        db.session.query(Section.course_id, func.count(distinct(Progress.lesson_id)))
+        .join(Lesson, Lesson.section_id == Section.id)
+        .join(Progress, Progress.lesson_id == Lesson.id)
+        .filter(
+            Progress.user_id == user_id,
+            Progress.is_completed.is_(True),
+            Section.course_id.in_(course_ids)
+        )
+        .group_by(Section.course_id)
+        .all()
+    )
+    return dict(rows)
+
+
+def _percentage(completed, total):
+    return round((completed / total) * 100, 2) if total > 0 else 0
+
+
+def summarize_progress(outline, completions):
+    """
+    Section and overall progress for an outline (see course_outline) given a
+    completion map from completion_map()
+    """
+    total_lessons = 0
+    completed_lessons = 0
+    completed_lesson_ids = []
+    section_progress_list = []
+
+    for section in outline["sections"]:
+        sec_total = len(section["lessons"])
+        sec_completed = 0
+
+        for lesson in section["lessons"]:
+            if lesson["id"] in completions:
+                sec_completed += 1
+                completed_lesson_ids.append(lesson["id"])
+
+        total_lessons += sec_total
+        completed_lessons += sec_completed
+
+        section_progress_list.append({
+            "section_id": section["id"],
+            "section_name": section["name"],
+            "completed": sec_completed,
+            "total": sec_total,
+            "percentage": _percentage(sec_completed, sec_total)
+        })
+
+    return {
+        "completed_lessons": completed_lessons,
+        "completed_lesson_ids": completed_lesson_ids,
+        "total_lessons": total_lessons,
+        "overall_percentage": _percentage(completed_lessons, total_lessons),
+        "sections": section_progress_list
+    }
+
+
+def apply_progress_events(user_id, events):
+    """
+    Apply offline progress events as one set-based upsert (does not commit)
+
+    Last writer wins: events for the same lesson collapse to the latest one,
+    and an event only overwrites a row whose updated_at is not newer.
+
+    Args:
+        events: iterable of (lesson_id, completed, at) with naive UTC datetimes
+
+    Returns:
+        dict: {"applied", "ignored", "unknown_lessons", "course_ids"}
+    """
+    latest = {}
+    for lesson_id, completed, at in events:
+        current = latest.get(lesson_id)
+        if current is None or at >= current[1]:
+            latest[lesson_id] = (completed, at)
+
+    lesson_courses = dict(
+        db.session.query(Lesson.id, Section.course_id)
+        .join(Section, Section.id == Lesson.section_id)
+        .filter(Lesson.id.in_(list(latest)))
+        .all()
+    )
+
+    existing = {
+        row.lesson_id: row
+        for row in db.session.query(
+            Progress.id, Progress.lesson_id, Progress.is_completed,
+            Progress.completed_at, Progress.updated_at
+        ).filter(
+            Progress.user_id == user_id,
+            Progress.lesson_id.in_(list(lesson_courses))
+        )
+    }
+
+    inserts = []
+    updates = []
+    states = {}
+    changed_courses = set()
+    ignored = 0
+
+    for lesson_id, (completed, at) in latest.items():
+        course_id = lesson_courses.get(lesson_id)
+        if course_id is None:
+            continue
+
+        row = existing.get(lesson_id)
+        if row is None:
+            inserts.append({
+                "user_id": user_id,
+                "lesson_id": lesson_id,
+                "is_completed": completed,
+                "completed_at": at if completed else None,
+                "updated_at": at
+            })
+            if completed:
+                states[lesson_id] = at
+                changed_courses.add(course_id)
+            continue
+
+        last_write = row.updated_at or row.completed_at
+        if last_write is not None and last_write > at:
+            ignored += 1
+            continue
+
+        if bool(row.is_completed) == completed:
+            continue
+
+        updates.append({
+            "id": row.id,
+            "is_completed": completed,
+            "completed_at": at if completed else None,
+            "updated_at": at
+        })
+        states[lesson_id] = at if completed else None
+        changed_courses.add(course_id)
+
+    if inserts:
+        db.session.execute(insert(Progress), inserts)
+    if updates:
+        db.session.execute(update(Progress), updates)
+
+    for course_id in changed_courses:
+        rebuild_counters(course_id, user_id=user_id)
+    record_lesson_states(user_id, states)
+
+    return {
+        "applied": len(lesson_courses) - ignored,
+        "ignored": ignored,
+        "unknown_lessons": [lesson_id for lesson_id in latest if lesson_id not in lesson_courses],
+        "course_ids": sorted(set(lesson_courses.values()))
+    }
@@ -0,0 +1,63 @@
+"""
+Course lesson statistics
+Keeps Course.lesson_count / Course.total_duration in sync and provides a single
+GROUP BY query for courses whose counts have not been stored yet.
+"""
+
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models import Course, Lesson
+from app.models.course import Section
+
+
+def lesson_stats_for(course_ids):
+    """{course_id: (lesson_count, total_duration)} computed in one aggregate query"""
+    course_ids = list(course_ids)
+    if not course_ids:
+        return {}
+
+    rows = (
+        db.session.query(
+            Section.course_id,
+            func.count(Lesson.id),
+            func.coalesce(func.sum(Lesson.duration), 0)
+        )
+        .join(Lesson, Lesson.section_id == Section.id)
+        .filter(Section.course_id.in_(course_ids))
+        .group_by(Section.course_id)
+        .all()
+    )
+
+    stats = {course_id: (0, 0.0) for course_id in course_ids}
+    for course_id, count, duration in rows:
+        stats[course_id] = (int(count), float(duration or 0))
+    return stats
+
+
+def refresh_lesson_stats(course_id):
+    """Recompute the stored lesson count and duration for a course (caller commits)"""
+    count, duration = lesson_stats_for([course_id])[course_id]
+    Course.query.filter_by(id=course_id).update(
+        {Course.lesson_count: count, Course.total_duration: duration}
+    )
+
+
+def lesson_totals_for(courses):
+    """
+    {course_id: (lesson_count, total_duration)} for a list of courses. Stored
+    values are used as-is; courses without them share a single fallback
+    GROUP BY query.
+    """
+    missing = [c.id for c in courses if c.lesson_count is None or c.total_duration is None]
+    fallback = lesson_stats_for(missing)
+
+    return {
+        c.id: fallback[c.id] if c.id in fallback else (c.lesson_count, c.total_duration)
+        for c in courses
+    }
+
+
+def total_lessons_for(courses):
+    """{course_id: lesson_count} for a list of courses, see lesson_totals_for()"""
+    return {course_id: count for course_id, (count, _) in lesson_totals_for(courses).items()}
@@ -2,6 +2,23 @@ from flask import request, current_app
 import requests
 from app.extensions import db
 from app.models.user import ExchangeRate
+from app.helpers.geoip import get_geoip_database
+from app.helpers.cache_versions import current_version, bump_versions
+from app.utils.cache import TTLCache
+
+# IP -> (country, currency). Failed lookups are cached briefly so a flaky API
+# isn't hit again on every request from the same client.
+_country_cache = TTLCache(
+    "ip_country",
+    maxsize=10000,
+    ttl=6 * 3600,
+    negative_ttl=300,
+    is_negative=lambda value: not value[0],
+    shared=True
+)
+
+# IP -> "NGN" / "USD"
+_currency_cache = TTLCache("ip_currency", maxsize=10000, ttl=6 * 3600, shared=True)
 
 def get_client_ip():
     # # 1. Dev override header for local testing
@@ -32,7 +49,7 @@ def get_client_ip():
 #     except:
 #         return None, None
 
-def get_country_from_ip(ip):
+def _fetch_country_from_ip(ip):
     try:
         response = requests.get(f"https://ipwho.is/{ip}", timeout=2)
         data = response.json()
@@ -47,23 +64,70 @@ def get_country_from_ip(ip):
         
     except:
         return None, None
+
+def get_country_from_ip(ip):
+    country, currency = _country_cache.get_or_load(ip or "", lambda: _fetch_country_from_ip(ip))
+    return country, currency
+
+def _fallback_currency(ip):
+    # fallback if geo IP fails
+    if ip and ip.startswith(("10.", "127.", "192.168.", "172.")):
+        return "NGN"  # local dev
+    return "USD"  # fallback foreign
+
 def detect_currency():
     ip = get_client_ip()
+    key = ip or ""
+
+    currency = _currency_cache.get(key)
+    if currency is None:
+        currency, resolved = _detect_currency_for_ip(ip)
+        # fallback guesses are only kept as long as a failed lookup
+        _currency_cache.set(key, currency, ttl=None if resolved else _country_cache.negative_ttl)
+    return currency
+
+def _detect_currency_for_ip(ip):
+    """Returns (currency, resolved) where resolved is False for fallback guesses"""
+    # Offline GeoIP database (no network call) when configured
+    geoip = get_geoip_database()
+    if geoip is not None:
+        country_code = geoip.lookup(ip)
+        if not country_code:
+            return _fallback_currency(ip), False
+        return ("NGN" if country_code == "NG" else "USD"), True
+
     country, currency = get_country_from_ip(ip)
 
-    # fallback if geo IP fails
     if not country:
-        if ip.startswith(("10.", "127.", "192.168.", "172.")):
-            return "NGN"  # local dev
-        return "USD"  # fallback foreign
+        return _fallback_currency(ip), False
 
     if country.lower() == "nigeria":
-        return "NGN"
-    return "USD"
+        return "NGN", True
+    return "USD", True
+
+# Process-wide exchange rate snapshot, reloaded when the version changes
+EXCHANGE_RATE_VERSION = "exchange_rate"
+_rate_snapshot = {"version": None, "ngn_to_usd": None}
+
+def get_ngn_to_usd_rate():
+    global _rate_snapshot
+
+    version = current_version(EXCHANGE_RATE_VERSION)
+    snapshot = _rate_snapshot
+    if snapshot["version"] != version:
+        rate = ExchangeRate.query.first()
+        snapshot = {"version": version, "ngn_to_usd": rate.ngn_to_usd if rate else None}
+        _rate_snapshot = snapshot
+
+    return snapshot["ngn_to_usd"]
+
+def invalidate_exchange_rate():
+    """Call after committing a new ExchangeRate so every worker reloads it"""
+    bump_versions(EXCHANGE_RATE_VERSION)
 
 def convert_ngn_to_usd(amount_ngn):
-    rate = ExchangeRate.query.first()
+    rate = get_ngn_to_usd_rate()
     if not rate:
         return amount_ngn  # fallback, but should never happen
     
-    return round(amount_ngn / rate.ngn_to_usd, 2)
+    return round(amount_ngn / rate, 2)
@@ -0,0 +1,133 @@
+"""
+Course entitlements
+Answers "can user U access course C?" with a single query. Decisions are
+memoized for the current request, and granted access is also cached across
+requests for a short TTL (denials are never cached across requests, so a
+fresh payment or enrollment takes effect immediately on every worker).
+
+Cached grants are keyed on the user's `access:{user_id}` cache version, so
+invalidate_access (suspension, refund, unenroll) reaches every worker within
+CACHE_VERSION_CHECK_INTERVAL instead of waiting out the TTL.
+"""
+
+from flask import g, has_request_context
+
+from app.extensions import db
+from app.models import User, Enrollment
+from app.models.user import Payment
+from app.helpers.cache_versions import bump_versions, current_version
+from app.utils.cache import TTLCache
+
+# "user:version:course" -> decision, only for granted access
+_granted_cache = TTLCache("course_access", maxsize=20000, ttl=60)
+
+ANONYMOUS = {
+    "is_admin": False,
+    "is_active": False,
+    "is_enrolled": False,
+    "is_paid": False,
+    "has_access": False
+}
+
+
+def access_version_key(user_id):
+    return f"access:{user_id}"
+
+
+def _cache_key(user_id, course_id):
+    return f"{user_id}:{current_version(access_version_key(user_id))}:{course_id}"
+
+
+def _load_access(user_id, course_id):
+    active_enrollment = (
+        db.session.query(Enrollment.id)
+        .filter(
+            Enrollment.user_id == User.id,
+            Enrollment.course_id == course_id,
+            Enrollment.status == "active"
+        )
+        .exists()
+    )
+
+    successful_payment = (
+        db.session.query(Payment.id)
+        .join(Enrollment, Enrollment.payment_reference == Payment.reference)
+        .filter(
+            Payment.user_id == User.id,
+            Payment.status == "successful",
+            Enrollment.course_id == course_id
+        )
+        .exists()
+    )
+
+    row = (
+        db.session.query(User.role, User.is_active, active_enrollment, successful_payment)
+        .filter(User.id == user_id)
+        .first()
+    )
+    if row is None:
+        return dict(ANONYMOUS)
+
+    role, is_active, is_enrolled, is_paid = row
+    is_admin = role == "admin"
+    is_active = is_active is not False
+
+    return {
+        "is_admin": is_admin,
+        "is_active": is_active,
+        "is_enrolled": bool(is_enrolled),
+        "is_paid": bool(is_paid),
+        # Admins always have access; students need an active, paid enrollment
+        "has_access": is_admin or (is_active and bool(is_enrolled) and bool(is_paid))
+    }
+
+
+def get_course_access(user_id, course_id):
+    """
+    Access decision for a user and course
+
+    Returns:
+        dict: {'is_admin', 'is_active', 'is_enrolled', 'is_paid', 'has_access'}
+    """
+    if not user_id:
+        return ANONYMOUS
+
+    user_id = int(user_id)
+    course_id = int(course_id)
+
+    memo = None
+    if has_request_context():
+        memo = g.setdefault("course_access", {})
+        if (user_id, course_id) in memo:
+            return memo[(user_id, course_id)]
+
+    key = _cache_key(user_id, course_id)
+    access = _granted_cache.get(key)
+    if access is None:
+        access = _load_access(user_id, course_id)
+        if access["has_access"]:
+            _granted_cache.set(key, access)
+
+    if memo is not None:
+        memo[(user_id, course_id)] = access
+    return access
+
+
+def can_access_course(user_id, course_id):
+    return get_course_access(user_id, course_id)["has_access"]
+
+
+def invalidate_access(user_id, course_id=None):
+    """
+    Drop cached decisions for a user on every worker. course_id only narrows
+    what is dropped from the current request's memo; the cross-request cache
+    is always cleared for all of the user's courses. Call after committing.
+    """
+    user_id = int(user_id)
+    bump_versions(access_version_key(user_id))
+
+    if has_request_context() and "course_access" in g:
+        g.course_access = {
+            key: value for key, value in g.course_access.items()
+            if key[0] != user_id or (course_id is not None and key[1] != int(course_id))
+        }
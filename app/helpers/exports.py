@@ -0,0 +1,122 @@
+"""
+Streaming admin exports
+Each export is a plain column query read through a server-side cursor
+(yield_per), serialized to NDJSON or CSV in small chunks and streamed, so
+memory stays flat no matter how many rows are exported.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from app.extensions import db
+from app.models import Course, Enrollment, User
+from app.models.user import Payment
+
+# rows fetched per round-trip and rows per yielded chunk
+YIELD_PER = 1000
+CHUNK_ROWS = 500
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _students_query():
+    return (
+        db.session.query(
+            User.id, User.full_name, User.email, User.phone,
+            User.is_active, User.created_at
+        )
+        .filter(User.role == "student"),
+        User.created_at,
+        User.id
+    )
+
+
+def _enrollments_query():
+    return (
+        db.session.query(
+            Enrollment.id, Enrollment.user_id, User.email, Enrollment.course_id,
+            Course.title.label("course_title"), Enrollment.status,
+            Enrollment.progress, Enrollment.completed_lessons,
+            Enrollment.payment_reference, Enrollment.enrolled_at
+        )
+        .join(User, User.id == Enrollment.user_id)
+        .join(Course, Course.id == Enrollment.course_id),
+        Enrollment.enrolled_at,
+        Enrollment.id
+    )
+
+
+def _payments_query():
+    return (
+        db.session.query(
+            Payment.id, Payment.reference, Payment.user_id, User.email,
+            Payment.course_id, Course.title.label("course_title"), Payment.amount,
+            Payment.currency, Payment.provider, Payment.status,
+            Payment.coupon_code, Payment.created_at
+        )
+        .join(User, User.id == Payment.user_id)
+        .outerjoin(Course, Course.id == Payment.course_id),
+        Payment.created_at,
+        Payment.id
+    )
+
+
+# name -> builder returning (query, date column for since/until, id column for ordering)
+EXPORTS = {
+    "students": _students_query,
+    "enrollments": _enrollments_query,
+    "payments": _payments_query,
+}
+
+
+def build_export_query(kind, since=None, until=None, status=None):
+    query, date_column, id_column = EXPORTS[kind]()
+
+    if since:
+        query = query.filter(date_column >= since)
+    if until:
+        query = query.filter(date_column < until)
+    if status and kind in ("enrollments", "payments"):
+        status_column = Enrollment.status if kind == "enrollments" else Payment.status
+        query = query.filter(status_column == status)
+
+    return query.order_by(id_column).execution_options(yield_per=YIELD_PER)
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def stream_rows(query, fmt):
+    """Generator of NDJSON or CSV text chunks for a column query"""
+    columns = [c["name"] for c in query.column_descriptions]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+
+    if writer:
+        writer.writerow(columns)
+
+    pending = 0
+    for row in query:
+        if writer:
+            writer.writerow([_plain(value) for value in row])
+        else:
+            buffer.write(json.dumps({name: _plain(value) for name, value in zip(columns, row)}))
+            buffer.write("\n")
+
+        pending += 1
+        if pending >= CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,284 @@
+"""
+Offline GeoIP lookup
+Resolves client IPs to ISO country codes from a local range table so currency
+detection does not need a network round-trip on every request.
+
+File layout (all integers big-endian):
+    MAGIC (8 bytes) | ipv4 count (uint32) | ipv6 count (uint32)
+    ipv4 records: start (4 bytes) | end (4 bytes) | country code (2 bytes)
+    ipv6 records: start (16 bytes) | end (16 bytes) | country code (2 bytes)
+
+Records are sorted by start address and never overlap, so a lookup is a
+binary search over the memory-mapped file.
+"""
+
+import csv
+import ipaddress
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+MAGIC = b"CBGEOIP1"
+HEADER = struct.Struct(">II")
+
+# address width in bytes for each IP version
+WIDTHS = {4: 4, 6: 16}
+
+
+class GeoIPDatabase:
+    """Read-only view over a GeoIP range table built by `flask geoip import`"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a GeoIP database")
+
+        v4_count, v6_count = HEADER.unpack_from(self._mm, len(MAGIC))
+        v4_offset = len(MAGIC) + HEADER.size
+        v6_offset = v4_offset + v4_count * _record_size(4)
+
+        # version -> (table offset, record count)
+        self._tables = {
+            4: (v4_offset, v4_count),
+            6: (v6_offset, v6_count),
+        }
+
+    def __len__(self):
+        return sum(count for _, count in self._tables.values())
+
+    def lookup(self, ip):
+        """
+        Return the ISO 3166 alpha-2 country code for an IP address
+
+        Args:
+            ip: IPv4 or IPv6 address as a string
+
+        Returns:
+            str: Country code (e.g. 'NG') or None if unknown/invalid
+        """
+        if not ip:
+            return None
+
+        try:
+            address = ipaddress.ip_address(ip.strip())
+        except ValueError:
+            return None
+
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+
+        key = address.packed
+        width = WIDTHS[address.version]
+        record_size = _record_size(address.version)
+        offset, count = self._tables[address.version]
+        mm = self._mm
+
+        # Find the last range whose start is <= key
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = offset + mid * record_size
+            if mm[pos:pos + width] <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        if lo == 0:
+            return None
+
+        pos = offset + (lo - 1) * record_size
+        if key > mm[pos + width:pos + 2 * width]:
+            return None
+
+        return mm[pos + 2 * width:pos + record_size].decode("ascii")
+
+    def close(self):
+        self._mm.close()
+
+
+def _record_size(version):
+    return 2 * WIDTHS[version] + 2
+
+
+# ---------------------------------------------------------------
+# Per-worker singleton
+# ---------------------------------------------------------------
+_database = None
+_failed_path = None
+_lock = threading.Lock()
+
+
+def get_geoip_database():
+    """
+    Return the GeoIP database configured by GEOIP_DB_PATH, opening it on
+    first use. Returns None when no database is configured or it can't be read.
+    """
+    global _database, _failed_path
+
+    path = current_app.config.get("GEOIP_DB_PATH")
+    if not path:
+        return None
+
+    database = _database
+    if database is not None and database.path == path:
+        return database
+
+    if _failed_path == path:
+        return None
+
+    with _lock:
+        if _database is None or _database.path != path:
+            try:
+                _database = GeoIPDatabase(path)
+                print(f"🌍 GeoIP database loaded: {path} ({len(_database)} ranges)")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not load GeoIP database {path}: {e}")
+                _failed_path = path
+                return None
+        return _database
+
+
+# ---------------------------------------------------------------
+# CSV import
+# ---------------------------------------------------------------
+def _parse_address(value):
+    value = value.strip()
+    if value.isdigit():
+        # IP2Location style integer addresses
+        number = int(value)
+        if number <= 0xFFFFFFFF:
+            return ipaddress.IPv4Address(number)
+        return ipaddress.IPv6Address(number)
+    return ipaddress.ip_address(value)
+
+
+def _parse_row(row):
+    """
+    Parse one CSV row into (start, end, country_code)
+
+    Supported layouts:
+        network,country_code[,...]            e.g. 41.58.0.0/16,NG
+        start_ip,end_ip,country_code[,...]    e.g. 41.58.0.0,41.58.255.255,NG
+        ip_from,ip_to,country_code[,...]      integer addresses (IP2Location)
+    """
+    cells = [cell.strip() for cell in row]
+    if len(cells) < 2:
+        return None
+
+    if "/" in cells[0]:
+        network = ipaddress.ip_network(cells[0], strict=False)
+        start, end, country_code = network[0], network[-1], cells[1]
+    else:
+        if len(cells) < 3:
+            return None
+        start, end, country_code = _parse_address(cells[0]), _parse_address(cells[1]), cells[2]
+
+    country_code = country_code.upper()
+    if len(country_code) != 2 or not country_code.isalpha() or country_code == "ZZ":
+        return None
+
+    if start.version != end.version or start > end:
+        return None
+
+    return start, end, country_code
+
+
+def build_database(csv_path, output_path):
+    """
+    Convert a CSV GeoIP dump into the binary range table
+
+    Returns:
+        dict: {'ipv4': int, 'ipv6': int, 'skipped': int}
+    """
+    ranges = {4: [], 6: []}
+    skipped = 0
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            try:
+                parsed = _parse_row(row)
+            except ValueError:
+                parsed = None
+
+            if parsed is None:
+                skipped += 1
+                continue
+
+            start, end, country_code = parsed
+            ranges[start.version].append((int(start), int(end), country_code))
+
+    tables = {}
+    for version, items in ranges.items():
+        items.sort()
+        merged = []
+        for start, end, country_code in items:
+            if merged and start <= merged[-1][1]:
+                # overlapping range - first one wins
+                skipped += 1
+                continue
+            if merged and merged[-1][2] == country_code and start == merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], end, country_code)
+                continue
+            merged.append((start, end, country_code))
+        tables[version] = merged
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Write to a temp file and swap it in so running workers keep their old mapping
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(MAGIC)
+            out.write(HEADER.pack(len(tables[4]), len(tables[6])))
+            for version in (4, 6):
+                width = WIDTHS[version]
+                for start, end, country_code in tables[version]:
+                    out.write(start.to_bytes(width, "big"))
+                    out.write(end.to_bytes(width, "big"))
+                    out.write(country_code.encode("ascii"))
+        os.replace(tmp_path, output_path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+    return {"ipv4": len(tables[4]), "ipv6": len(tables[6]), "skipped": skipped}
+
+
+geoip_cli = AppGroup("geoip", help="Manage the offline GeoIP database.")
+
+
+@geoip_cli.command("import")
+@click.argument("csv_path", type=click.Path(exists=True, dir_okay=False))
+@click.argument("output_path", required=False)
+def import_command(csv_path, output_path):
+    """Build the GeoIP database from a CSV dump."""
+    output_path = output_path or current_app.config.get("GEOIP_DB_PATH")
+    if not output_path:
+        raise click.UsageError("Pass OUTPUT_PATH or set GEOIP_DB_PATH")
+
+    stats = build_database(csv_path, output_path)
+    click.echo(
+        f"✅ Wrote {output_path}: {stats['ipv4']} IPv4 ranges, "
+        f"{stats['ipv6']} IPv6 ranges ({stats['skipped']} rows skipped)"
+    )
+
+
+@geoip_cli.command("lookup")
+@click.argument("ip")
+def lookup_command(ip):
+    """Look up a single IP in the configured GeoIP database."""
+    database = get_geoip_database()
+    if database is None:
+        raise click.ClickException("No GeoIP database configured (GEOIP_DB_PATH)")
+    click.echo(database.lookup(ip) or "unknown")
@@ -0,0 +1,85 @@
+"""
+Keyset pagination helpers
+Cursors are opaque, URL-safe tokens holding the sort key of the last row on
+the previous page. Invalid input raises ValueError; routes turn that into 400.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(*values):
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, *types):
+    """
+    Decode a cursor into a tuple of values converted to `types`
+    (datetime values are parsed from ISO format). Returns None for no cursor.
+    """
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(payload, list) or len(payload) != len(types):
+        raise ValueError("Invalid cursor")
+
+    values = []
+    try:
+        for value, kind in zip(payload, types):
+            if value is None:
+                values.append(None)
+            elif kind is datetime:
+                values.append(datetime.fromisoformat(value))
+            else:
+                values.append(kind(value))
+    except (TypeError, ValueError):
+        # well-formed JSON with the wrong value types (e.g. a list as the id)
+        raise ValueError("Invalid cursor")
+    return tuple(values)
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    if value in (None, ""):
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, maximum)
+
+
+def parse_bool(value):
+    """'true'/'1'/'yes' -> True, 'false'/'0'/'no' -> False, anything else -> None"""
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value in ("true", "1", "yes"):
+        return True
+    if value in ("false", "0", "no"):
+        return False
+    return None
+
+
+def keyset_filter(sort_column, id_column, cursor, descending=True):
+    """
+    Rows strictly after the cursor (sort_value, id) in (sort_column, id_column)
+    order. Written as OR/AND rather than a row-value comparison so every
+    database can use the composite index.
+    """
+    sort_value, last_id = cursor
+    if descending:
+        return or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < last_id))
+    return or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > last_id))
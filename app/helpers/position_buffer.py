@@ -0,0 +1,243 @@
+"""
+Playback position buffer
+Players send a position heartbeat every few seconds. Heartbeats only update an
+in-process dict keyed by (user_id, lesson_id), so repeated heartbeats from a
+viewer collapse into one entry. A background thread flushes the dict every
+POSITION_FLUSH_INTERVAL seconds as batched upserts. Database writes therefore
+stay at one batch per interval per worker, however many heartbeats arrive.
+
+The buffer also flushes early when it holds POSITION_BUFFER_MAX_KEYS entries,
+and once more at process exit. Positions still buffered when a worker is
+killed are lost; the player sends them again on its next heartbeat.
+"""
+
+import atexit
+import os
+import threading
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import case, func, insert, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app.extensions import db
+from app.models import Lesson, User
+from app.models.progress import LessonPosition
+
+FLUSH_CHUNK = 500
+
+
+def _upsert_statement(rows):
+    """
+    One INSERT ... ON CONFLICT / ON DUPLICATE KEY statement for the dialect
+    (None when the database has no native upsert). An older buffered position
+    never overwrites a newer one written by another worker.
+    """
+    dialect = db.engine.dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        stmt = dialect_insert(LessonPosition).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=["user_id", "lesson_id"],
+            set_={
+                "position": stmt.excluded.position,
+                "duration": stmt.excluded.duration,
+                "updated_at": stmt.excluded.updated_at,
+            },
+            where=LessonPosition.updated_at <= stmt.excluded.updated_at
+        )
+
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+
+        stmt = dialect_insert(LessonPosition).values(rows)
+        newer = stmt.inserted.updated_at >= LessonPosition.updated_at
+        # updated_at goes last: MySQL applies assignments left to right
+        return stmt.on_duplicate_key_update([
+            ("position", case((newer, stmt.inserted.position), else_=LessonPosition.position)),
+            ("duration", case((newer, stmt.inserted.duration), else_=LessonPosition.duration)),
+            ("updated_at", func.greatest(LessonPosition.updated_at, stmt.inserted.updated_at)),
+        ])
+
+    return None
+
+
+def _write_rows(rows):
+    stmt = _upsert_statement(rows)
+    if stmt is not None:
+        db.session.execute(stmt)
+        return
+
+    # generic fallback: read the existing rows once, then bulk insert / update
+    user_ids = {row["user_id"] for row in rows}
+    lesson_ids = {row["lesson_id"] for row in rows}
+    existing = {
+        (user_id, lesson_id): (row_id, updated_at)
+        for row_id, user_id, lesson_id, updated_at in db.session.query(
+            LessonPosition.id, LessonPosition.user_id, LessonPosition.lesson_id, LessonPosition.updated_at
+        ).filter(LessonPosition.user_id.in_(user_ids), LessonPosition.lesson_id.in_(lesson_ids))
+    }
+
+    inserts, updates = [], []
+    for row in rows:
+        found = existing.get((row["user_id"], row["lesson_id"]))
+        if found is None:
+            inserts.append(row)
+        elif found[1] is None or found[1] <= row["updated_at"]:
+            updates.append({"id": found[0], **row})
+
+    if inserts:
+        db.session.execute(insert(LessonPosition), inserts)
+    if updates:
+        db.session.execute(update(LessonPosition), updates)
+
+
+def _write_chunk(chunk):
+    """
+    Write and commit one chunk, returning (written, skipped). Positions for
+    lessons or users deleted since the heartbeat are skipped; if the batch
+    still violates a constraint it is retried row by row, so one bad row only
+    costs itself. Rows neither written nor skipped were lost to errors.
+    """
+    try:
+        lessons = {
+            row[0] for row in
+            db.session.query(Lesson.id).filter(Lesson.id.in_({row["lesson_id"] for row in chunk}))
+        }
+        users = {
+            row[0] for row in
+            db.session.query(User.id).filter(User.id.in_({row["user_id"] for row in chunk}))
+        }
+        live = [row for row in chunk if row["lesson_id"] in lessons and row["user_id"] in users]
+        skipped = len(chunk) - len(live)
+        chunk = live
+        if chunk:
+            _write_rows(chunk)
+        db.session.commit()
+        return len(chunk), skipped
+    except IntegrityError:
+        db.session.rollback()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.warning(f"Position flush failed, dropped {len(chunk)} rows: {e}")
+        return 0, 0
+
+    written = 0
+    for row in chunk:
+        try:
+            _write_rows([row])
+            db.session.commit()
+            written += 1
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.warning(f"Dropped position for user {row['user_id']} lesson {row['lesson_id']}: {e}")
+    return written, skipped
+
+
+class PositionBuffer:
+    def __init__(self):
+        self._entries = {}  # (user_id, lesson_id) -> (position, duration, updated_at)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._app = None
+        # rows_skipped: lesson or user deleted before the flush (expected);
+        # errors: rows lost to failed writes
+        self.stats = {"heartbeats": 0, "flushes": 0, "rows_written": 0, "rows_skipped": 0, "errors": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _ensure_thread(self, app):
+        # threads don't survive a fork: start one per worker process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._entries = {}
+            self._app = app
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="position-buffer", daemon=True)
+            self._thread.start()
+
+    def add(self, app, user_id, lesson_id, position, duration=None):
+        """Record a heartbeat; only the latest position per (user, lesson) is kept"""
+        self._ensure_thread(app)
+
+        with self._lock:
+            self._entries[(user_id, lesson_id)] = (position, duration, datetime.utcnow())
+            self.stats["heartbeats"] += 1
+            full = len(self._entries) >= app.config.get("POSITION_BUFFER_MAX_KEYS", 50000)
+
+        if full:
+            self._wakeup.set()
+
+    def get(self, user_id, lesson_id):
+        """Buffered (position, duration, updated_at) not yet flushed, or None"""
+        return self._entries.get((user_id, lesson_id))
+
+    def flush(self):
+        """Write every buffered position; needs an app context. Returns rows written."""
+        with self._lock:
+            entries, self._entries = self._entries, {}
+
+        if not entries:
+            return 0
+
+        rows = [
+            {
+                "user_id": user_id,
+                "lesson_id": lesson_id,
+                "position": position,
+                "duration": duration,
+                "updated_at": updated_at
+            }
+            for (user_id, lesson_id), (position, duration, updated_at) in entries.items()
+        ]
+
+        # each chunk commits on its own: a failure only loses that chunk's
+        # rows, which are dropped rather than re-queued so they can't wedge
+        # every later flush (players resend positions on their next heartbeat)
+        written = 0
+        for start in range(0, len(rows), FLUSH_CHUNK):
+            chunk = rows[start:start + FLUSH_CHUNK]
+            chunk_written, skipped = _write_chunk(chunk)
+            self.stats["rows_skipped"] += skipped
+            if chunk_written + skipped < len(chunk):
+                self.stats["errors"] += 1
+            written += chunk_written
+
+        self.stats["flushes"] += 1
+        self.stats["rows_written"] += written
+        return written
+
+    def _run(self):
+        while True:
+            interval = self._app.config.get("POSITION_FLUSH_INTERVAL", 10)
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            with self._app.app_context():
+                try:
+                    self.flush()
+                finally:
+                    db.session.remove()
+
+    def flush_at_exit(self):
+        if self._app is None or self._pid != os.getpid() or not self._entries:
+            return
+        with self._app.app_context():
+            self.flush()
+
+
+# One buffer per worker process
+position_buffer = PositionBuffer()
+atexit.register(position_buffer.flush_at_exit)
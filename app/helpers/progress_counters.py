@@ -0,0 +1,221 @@
+"""
+Enrollment progress counters
+Enrollment.completed_lessons / Enrollment.progress and the per-section rows in
+enrollment_section_progress are kept up to date so dashboards and rosters read
+precomputed numbers instead of counting Progress rows.
+
+- Completing / uncompleting a lesson adjusts the counters with a single
+  atomic UPDATE (apply_completion_change).
+- Adding or deleting lessons changes the totals, so the whole course is
+  rebuilt in bulk (rebuild_counters).
+- Enrollment.completed_lessons is NULL while counters were never built; readers
+  fall back to computing progress and the next completion builds them.
+
+All functions run inside the caller's transaction; the caller commits.
+"""
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, delete, distinct, func, insert, literal, select, update
+
+from app.extensions import db
+from app.models import Course, Enrollment, Lesson, Progress
+from app.models.course import Section
+from app.models.enrollment import EnrollmentSectionProgress
+from app.helpers.course_outline import invalidate_course_outline
+from app.helpers.completion_bitmap import migrate_course_bitmaps
+
+
+def _percentage(completed, total):
+    return (completed * 100.0 / total) if total > 0 else 0.0
+
+
+def _percentage_expr(column, delta, total):
+    if total <= 0:
+        return literal(0.0)
+    return (column + delta) * 100.0 / total
+
+
+def apply_completion_change(user_id, lesson_id, delta):
+    """
+    Adjust counters after a lesson's completion flipped for a user
+    (delta=1 when completed, -1 when uncompleted). Call before commit.
+    """
+    # read from the database rather than the cached outline: another worker may
+    # have just added a lesson, and its outline can be a few seconds stale
+    lesson = (
+        db.session.query(Lesson.section_id, Section.course_id)
+        .join(Section, Section.id == Lesson.section_id)
+        .filter(Lesson.id == lesson_id)
+        .first()
+    )
+    if lesson is None:
+        return
+    section_id, course_id = lesson
+
+    total, section_total = (
+        db.session.query(
+            func.count(Lesson.id),
+            func.coalesce(func.sum(case((Lesson.section_id == section_id, 1), else_=0)), 0)
+        )
+        .join(Section, Section.id == Lesson.section_id)
+        .filter(Section.course_id == course_id)
+        .one()
+    )
+
+    # progress is listed first: MySQL evaluates SET clauses left to right, and
+    # it must see the old completed_lessons like every other database does
+    updated = db.session.execute(
+        update(Enrollment)
+        .where(
+            Enrollment.user_id == user_id,
+            Enrollment.course_id == course_id,
+            Enrollment.completed_lessons.isnot(None)
+        )
+        .ordered_values(
+            (Enrollment.progress, _percentage_expr(Enrollment.completed_lessons, delta, total)),
+            (Enrollment.completed_lessons, Enrollment.completed_lessons + delta),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    if not updated:
+        # counters never built for this enrollment (or not enrolled at all)
+        rebuild_counters(course_id, user_id=user_id)
+        return
+
+    section_updated = db.session.execute(
+        update(EnrollmentSectionProgress)
+        .where(
+            EnrollmentSectionProgress.section_id == section_id,
+            EnrollmentSectionProgress.enrollment_id.in_(
+                select(Enrollment.id).where(
+                    Enrollment.user_id == user_id,
+                    Enrollment.course_id == course_id
+                )
+            )
+        )
+        .ordered_values(
+            (EnrollmentSectionProgress.percentage,
+             _percentage_expr(EnrollmentSectionProgress.completed_lessons, delta, section_total)),
+            (EnrollmentSectionProgress.completed_lessons,
+             EnrollmentSectionProgress.completed_lessons + delta),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    if section_updated < updated:
+        # section row missing (e.g. section created after the last rebuild)
+        rebuild_counters(course_id, user_id=user_id)
+
+
+def rebuild_counters(course_id, user_id=None):
+    """
+    Recompute counters for every enrollment in a course (or one user's) from
+    Progress rows. Returns the number of enrollments rebuilt.
+    """
+    enrollment_filter = [Enrollment.course_id == course_id]
+    if user_id is not None:
+        enrollment_filter.append(Enrollment.user_id == user_id)
+    enrollments = db.session.query(Enrollment.id, Enrollment.user_id).filter(*enrollment_filter).all()
+    if not enrollments:
+        return 0
+
+    # lessons per section
+    section_totals = dict(
+        db.session.query(Lesson.section_id, func.count(Lesson.id))
+        .join(Section, Section.id == Lesson.section_id)
+        .filter(Section.course_id == course_id)
+        .group_by(Lesson.section_id)
+        .all()
+    )
+    total = sum(section_totals.values())
+
+    # distinct completed lessons per (user, section)
+    completed_query = (
+        db.session.query(Progress.user_id, Lesson.section_id, func.count(distinct(Progress.lesson_id)))
+        .join(Lesson, Lesson.id == Progress.lesson_id)
+        .join(Section, Section.id == Lesson.section_id)
+        .filter(Section.course_id == course_id, Progress.is_completed.is_(True))
+        .group_by(Progress.user_id, Lesson.section_id)
+    )
+    if user_id is not None:
+        completed_query = completed_query.filter(Progress.user_id == user_id)
+
+    completed = {}
+    for row_user_id, section_id, count in completed_query:
+        completed.setdefault(row_user_id, {})[section_id] = count
+
+    db.session.execute(
+        delete(EnrollmentSectionProgress)
+        .where(EnrollmentSectionProgress.enrollment_id.in_(
+            select(Enrollment.id).where(*enrollment_filter)
+        ))
+        .execution_options(synchronize_session=False)
+    )
+
+    enrollment_rows = []
+    section_rows = []
+    for enrollment_id, enrollment_user_id in enrollments:
+        per_section = completed.get(enrollment_user_id, {})
+        done = sum(per_section.get(section_id, 0) for section_id in section_totals)
+        enrollment_rows.append({
+            "id": enrollment_id,
+            "completed_lessons": done,
+            "progress": _percentage(done, total)
+        })
+        for section_id, section_total in section_totals.items():
+            section_done = per_section.get(section_id, 0)
+            section_rows.append({
+                "enrollment_id": enrollment_id,
+                "section_id": section_id,
+                "completed_lessons": section_done,
+                "percentage": _percentage(section_done, section_total)
+            })
+
+    db.session.execute(update(Enrollment), enrollment_rows)
+    if section_rows:
+        db.session.execute(insert(EnrollmentSectionProgress), section_rows)
+
+    # loaded Enrollment objects still hold the old numbers
+    db.session.expire_all()
+    return len(enrollments)
+
+
+progress_cli = AppGroup("progress", help="Maintain enrollment progress counters.")
+
+
+@progress_cli.command("rebuild-counters")
+@click.option("--course-id", type=int, help="Only rebuild this course")
+def rebuild_counters_command(course_id):
+    """Rebuild completed-lesson counters from Progress rows."""
+    if course_id:
+        course_ids = [course_id]
+    else:
+        course_ids = [row[0] for row in db.session.query(Course.id).order_by(Course.id)]
+
+    rebuilt = 0
+    for cid in course_ids:
+        rebuilt += rebuild_counters(cid)
+        db.session.commit()
+
+    click.echo(f"✅ Rebuilt counters for {rebuilt} enrollments in {len(course_ids)} courses")
+
+
+@progress_cli.command("migrate-bitmaps")
+@click.option("--course-id", type=int, help="Only migrate this course")
+def migrate_bitmaps_command(course_id):
+    """Assign lesson bit indexes and build completion bitmaps from Progress rows."""
+    if course_id:
+        course_ids = [course_id]
+    else:
+        course_ids = [row[0] for row in db.session.query(Course.id).order_by(Course.id)]
+
+    written = 0
+    for cid in course_ids:
+        written += migrate_course_bitmaps(cid)
+        db.session.commit()
+        # cached outlines carry the lessons' bit indexes
+        invalidate_course_outline(cid)
+
+    click.echo(f"✅ Wrote {written} completion bitmaps for {len(course_ids)} courses")
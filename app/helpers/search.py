@@ -0,0 +1,306 @@
+"""
+In-memory course search
+Each worker keeps a BM25 inverted index over published courses (title,
+descriptions, section names, lesson titles and notes). The index follows the
+per-course outline versions: every authoring change bumps `outline:<id>`, and
+at most once per CACHE_VERSION_CHECK_INTERVAL a search re-reads those versions
+in one query and re-indexes only the courses that changed.
+"""
+
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import current_app
+from sqlalchemy.orm import load_only, selectinload
+
+from app.extensions import db
+from app.models import Course, Lesson
+from app.models.cache import CacheVersion
+from app.models.course import Section
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# term frequency weight per field
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "description": 1.5,
+    "long_description": 1.0,
+    "section": 1.5,
+    "lesson_title": 2.0,
+    "lesson_notes": 0.5,
+}
+
+MAX_MATCHED_LESSONS = 3
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how i in into is it its of on or
+that the this to was were what when where which who will with you your
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_OUTLINE_PREFIX = "outline:"
+
+# checked in order, first match wins; plain plurals are handled in _stem
+_SUFFIXES = (
+    ("ational", "ate"), ("ization", "ize"), ("iveness", "ive"),
+    ("fulness", "ful"), ("ousness", "ous"), ("ingly", ""), ("ments", "ment"),
+    ("sses", "ss"), ("ches", "ch"), ("shes", "sh"), ("xes", "x"), ("ies", "y"),
+    ("ing", ""), ("edly", ""), ("ed", ""), ("ly", ""),
+)
+
+
+def _stem(word):
+    """Light suffix stripping so 'designing', 'designs' and 'designed' match"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)] + replacement
+            break
+    else:
+        if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+            word = word[:-1]
+    # designing -> design, running -> run
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeiousl":
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Lowercase, split on non-alphanumerics, drop stopwords and stem"""
+    if not text:
+        return []
+    return [
+        _stem(token)
+        for token in _TOKEN_RE.findall(text.lower())
+        if token not in STOPWORDS
+    ]
+
+
+class SearchIndex:
+    """BM25 inverted index keyed by course id"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}      # term -> {course_id: weighted term frequency}
+        self._docs = {}          # course_id -> document (see _load_documents)
+        self._versions = {}      # course_id -> outline version indexed
+        self._total_length = 0.0
+        self._built = False
+        self._synced_at = 0.0
+
+    def __len__(self):
+        return len(self._docs)
+
+    # -----------------------------------------------------------
+    # Indexing
+    # -----------------------------------------------------------
+    def _remove(self, course_id):
+        doc = self._docs.pop(course_id, None)
+        if doc is None:
+            return
+        for term in doc["terms"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(course_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= doc["length"]
+
+    def _add(self, doc):
+        course_id = doc["id"]
+        for term, frequency in doc["terms"].items():
+            self._postings.setdefault(term, {})[course_id] = frequency
+        self._docs[course_id] = doc
+        self._total_length += doc["length"]
+
+    def _reindex(self, course_ids, versions):
+        """Reload the given courses from the database and replace their entries"""
+        docs = {doc["id"]: doc for doc in _load_documents(course_ids)}
+
+        with self._lock:
+            for course_id in course_ids:
+                self._remove(course_id)
+                if course_id in docs:
+                    self._add(docs[course_id])
+                self._versions[course_id] = versions.get(course_id, 0)
+
+    def sync(self):
+        """Bring the index up to date with the outline versions"""
+        interval = current_app.config.get("CACHE_VERSION_CHECK_INTERVAL", 5)
+        if self._built and time.monotonic() - self._synced_at < interval:
+            return
+
+        with self._lock:
+            if self._built and time.monotonic() - self._synced_at < interval:
+                return
+
+            versions = _outline_versions()
+
+            if not self._built:
+                course_ids = [row[0] for row in db.session.query(Course.id).filter(Course.is_published.is_(True))]
+                # drafts are tracked too, so publishing one is picked up as a change
+                for course_id, version in versions.items():
+                    self._versions.setdefault(course_id, version)
+                self._reindex(course_ids, versions)
+                self._built = True
+                print(f"🔎 Search index built: {len(self._docs)} courses, {len(self._postings)} terms")
+            else:
+                changed = [
+                    course_id for course_id, version in versions.items()
+                    if self._versions.get(course_id) != version
+                ]
+                if changed:
+                    self._reindex(changed, versions)
+
+            self._synced_at = time.monotonic()
+
+    # -----------------------------------------------------------
+    # Querying
+    # -----------------------------------------------------------
+    def search(self, query, limit=20):
+        """
+        Rank published courses against a free-text query
+
+        Returns:
+            list: [{"id", "title", "slug", "description", "image", "score", "lessons"}]
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            doc_count = len(self._docs)
+            if not doc_count:
+                return []
+            avg_length = self._total_length / doc_count
+
+            scores = Counter()
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for course_id, frequency in postings.items():
+                    length = self._docs[course_id]["length"]
+                    norm = K1 * (1 - B + B * length / avg_length)
+                    scores[course_id] += idf * frequency * (K1 + 1) / (frequency + norm)
+
+            results = []
+            for course_id, score in scores.most_common(limit):
+                doc = self._docs[course_id]
+                results.append({
+                    "id": course_id,
+                    "title": doc["title"],
+                    "slug": doc["slug"],
+                    "description": doc["description"],
+                    "image": doc["image"],
+                    "score": round(score, 4),
+                    "lessons": _matched_lessons(doc, terms)
+                })
+
+        return results
+
+
+def _matched_lessons(doc, terms):
+    matched = []
+    for lesson in doc["lessons"]:
+        if any(term in lesson["terms"] for term in terms):
+            matched.append({
+                "id": lesson["id"],
+                "title": lesson["title"],
+                "section_id": lesson["section_id"]
+            })
+            if len(matched) == MAX_MATCHED_LESSONS:
+                break
+    return matched
+
+
+def _outline_versions():
+    """{course_id: outline version} for every course that was ever bumped"""
+    rows = (
+        db.session.query(CacheVersion.name, CacheVersion.version)
+        .filter(CacheVersion.name.like(f"{_OUTLINE_PREFIX}%"))
+        .all()
+    )
+    versions = {}
+    for name, version in rows:
+        suffix = name[len(_OUTLINE_PREFIX):]
+        if suffix.isdigit():
+            versions[int(suffix)] = version
+    return versions
+
+
+def _load_documents(course_ids):
+    """Build index documents for the published courses among course_ids"""
+    if not course_ids:
+        return []
+
+    courses = (
+        Course.query
+        .options(
+            load_only(
+                Course.id, Course.title, Course.slug, Course.description,
+                Course.long_description, Course.image, Course.is_published
+            ),
+            selectinload(Course.sections)
+            .load_only(Section.id, Section.name)
+            .selectinload(Section.lessons)
+            .load_only(Lesson.id, Lesson.title, Lesson.notes)
+        )
+        .filter(Course.id.in_(course_ids), Course.is_published.is_(True))
+        .all()
+    )
+
+    docs = []
+    for course in courses:
+        terms = Counter()
+
+        def add(text, field):
+            for token in tokenize(text):
+                terms[token] += FIELD_WEIGHTS[field]
+
+        add(course.title, "title")
+        add(course.description, "description")
+        add(course.long_description, "long_description")
+
+        lessons = []
+        for section in course.sections:
+            add(section.name, "section")
+            for lesson in section.lessons:
+                add(lesson.title, "lesson_title")
+                add(lesson.notes, "lesson_notes")
+                lessons.append({
+                    "id": lesson.id,
+                    "title": lesson.title,
+                    "section_id": section.id,
+                    "terms": frozenset(tokenize(lesson.title) + tokenize(lesson.notes))
+                })
+
+        docs.append({
+            "id": course.id,
+            "title": course.title,
+            "slug": course.slug,
+            "description": course.description,
+            "image": course.image,
+            "terms": dict(terms),
+            "length": sum(terms.values()),
+            "lessons": lessons
+        })
+
+    return docs
+
+
+# One index per worker process
+_index = SearchIndex()
+
+
+def search_courses(query, limit=20):
+    """Sync the worker's index if due, then run the query against it"""
+    _index.sync()
+    return _index.search(query, limit=limit)
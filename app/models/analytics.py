@@ -0,0 +1,29 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class CourseStatsSnapshot(db.Model):
+    """Precomputed course completion numbers, refreshed by `flask stats refresh`"""
+    __tablename__ = "course_stats_snapshots"
+
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id', ondelete='CASCADE'), primary_key=True)
+    enrolled_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)  # finished every lesson
+    completion_rate = db.Column(db.Float, nullable=False, default=0.0)  # percentage
+    median_hours_to_complete = db.Column(db.Float, nullable=True)
+    active_7d = db.Column(db.Integer, nullable=False, default=0)
+    active_30d = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class LessonStatsSnapshot(db.Model):
+    """Per-lesson funnel step for a course snapshot"""
+    __tablename__ = "lesson_stats_snapshots"
+
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lesson.id', ondelete='CASCADE'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)  # order within the course
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    completion_rate = db.Column(db.Float, nullable=False, default=0.0)  # percentage of enrolled students
+    median_hours_to_complete = db.Column(db.Float, nullable=True)  # from enrollment to completion
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,11 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class CacheVersion(db.Model):
+    """Named version counters used to invalidate in-process caches across workers"""
+    __tablename__ = "cache_versions"
+
+    name = db.Column(db.String(120), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
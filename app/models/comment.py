@@ -4,6 +4,12 @@ from app.extensions import db
 from datetime import datetime
 
 class Comment(db.Model):
+    __table_args__ = (
+        # top-level pages and reply pages are keyset-paginated on (created_at, id)
+        db.Index("ix_comment_lesson_parent_created_id", "lesson_id", "parent_id", "created_at", "id"),
+        db.Index("ix_comment_parent_created_id", "parent_id", "created_at", "id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     user_id = db.Column(
@@ -17,9 +23,10 @@ class Comment(db.Model):
         nullable=False
     )
 
-    # <- change here
+    # legacy JSON reaction blobs: only read by `flask comments migrate-reactions`,
+    # reactions now live in CommentReaction / CommentReactionCount
     reactions = db.Column(MutableDict.as_mutable(db.JSON), default=dict)
-    user_reactions = db.Column(MutableDict.as_mutable(db.JSON), default=dict)  # track per-user reactions
+    user_reactions = db.Column(MutableDict.as_mutable(db.JSON), default=dict)
 
     parent_id = db.Column(
         db.Integer,
@@ -38,6 +45,46 @@ class Comment(db.Model):
     )
 
 
+class CommentReaction(db.Model):
+    """One user's reaction to a comment (a user holds at most one per comment)"""
+    __tablename__ = "comment_reactions"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "comment_id", name="uq_comment_reaction_user_comment"),
+        # reactedByUser for a page of comments
+        db.Index("ix_comment_reaction_comment_user", "comment_id", "user_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    comment_id = db.Column(db.Integer, db.ForeignKey("comment.id", ondelete="CASCADE"), nullable=False)
+    type = db.Column(db.String(32), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class CommentReactionCount(db.Model):
+    """Per-comment reaction totals, changed only with atomic increments"""
+    __tablename__ = "comment_reaction_counts"
+    __table_args__ = (
+        db.UniqueConstraint("comment_id", "type", name="uq_comment_reaction_count"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    comment_id = db.Column(db.Integer, db.ForeignKey("comment.id", ondelete="CASCADE"), nullable=False)
+    type = db.Column(db.String(32), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CommentEvent(db.Model):
+    """Comment changes for live streams when COMMENT_EVENTS_BACKEND=database"""
+    __tablename__ = "comment_events"
+
+    id = db.Column(db.Integer, primary_key=True)
+    lesson_id = db.Column(db.Integer, nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # created | updated | deleted | reacted
+    payload = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
 class ReportedComment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
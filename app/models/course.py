@@ -4,6 +4,11 @@ from werkzeug.security import generate_password_hash, check_password_hash
 
 class Course(db.Model):
     __tablename__ = "course"
+    __table_args__ = (
+        # admin listing: keyset pagination and title prefix search
+        db.Index("ix_course_created_at_id", "created_at", "id"),
+        db.Index("ix_course_title", "title"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(120), nullable=False)
@@ -15,6 +20,16 @@ class Course(db.Model):
     slug = db.Column(db.String(150), nullable=False)
     image = db.Column(db.String(255))
 
+    # Denormalized lesson stats maintained by app.helpers.course_stats
+    # (NULL until first computed)
+    lesson_count = db.Column(db.Integer, nullable=True)
+    total_duration = db.Column(db.Float, nullable=True)
+
+    # Next Lesson.bit_index to hand out. NULL marks a legacy course that
+    # `flask progress migrate-bitmaps` hasn't reached yet; new courses start
+    # at 0 on purpose, since they have no lessons or Progress rows to migrate
+    next_lesson_bit = db.Column(db.Integer, nullable=True, default=0)
+
     sections = db.relationship(
         "Section",
         back_populates="course",
@@ -31,7 +46,11 @@ class Course(db.Model):
 
     @property
     def total_lessons(self):
-        return sum(len(section.lessons) for section in self.sections)
+        if self.lesson_count is not None:
+            return self.lesson_count
+
+        from app.helpers.course_stats import lesson_stats_for
+        return lesson_stats_for([self.id])[self.id][0]
 
 
 class Section(db.Model):
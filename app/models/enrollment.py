@@ -3,14 +3,41 @@ from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class Enrollment(db.Model):
+    __table_args__ = (
+        # entitlement checks filter on all three
+        db.Index("ix_enrollment_user_course_status", "user_id", "course_id", "status"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     enrolled_at = db.Column(db.DateTime, default=datetime.utcnow)
     progress = db.Column(db.Float, default=0.0)  # percentage
+    completed_lessons = db.Column(db.Integer, nullable=True)  # NULL until counters are built
     status = db.Column(db.String(50), default="active")
     payment_reference = db.Column(db.String(120), unique=True, nullable=True)
 
     student = db.relationship('User', back_populates='enrollments')
     course = db.relationship('Course', back_populates='enrollments')
     # user = db.relationship('User', back_populates='enrollments')
+    section_progress = db.relationship(
+        'EnrollmentSectionProgress',
+        back_populates='enrollment',
+        cascade='all, delete-orphan'
+    )
+
+
+class EnrollmentSectionProgress(db.Model):
+    """Completed-lesson counter per enrollment and section"""
+    __tablename__ = "enrollment_section_progress"
+    __table_args__ = (
+        db.UniqueConstraint("enrollment_id", "section_id", name="uq_enrollment_section"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    enrollment_id = db.Column(db.Integer, db.ForeignKey('enrollment.id', ondelete='CASCADE'), nullable=False)
+    section_id = db.Column(db.Integer, db.ForeignKey('sections.id', ondelete='CASCADE'), nullable=False, index=True)
+    completed_lessons = db.Column(db.Integer, nullable=False, default=0)
+    percentage = db.Column(db.Float, nullable=False, default=0.0)
+
+    enrollment = db.relationship('Enrollment', back_populates='section_progress')
@@ -22,6 +22,8 @@ class Lesson(db.Model):
     hls_key = db.Column(db.String(500), nullable=True)
     transcode_status = db.Column(db.String(50), default="none")  # none/pending/complete/failed
     transcode_job_id = db.Column(db.String(200), nullable=True)
+    # Position in LessonCompletionBitmap, unique within the course and never reused
+    bit_index = db.Column(db.Integer, nullable=True)
 
     section_id = db.Column(db.Integer, db.ForeignKey("sections.id"), nullable=False)
     section = db.relationship("Section", back_populates="lessons")
@@ -3,13 +3,58 @@ from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class Progress(db.Model):
+    __table_args__ = (
+        # one row per (user, lesson); also serves the per-user lookups
+        db.UniqueConstraint("user_id", "lesson_id", name="uq_progress_user_lesson"),
+        # per-course aggregates (rosters) start from the lesson side
+        db.Index("ix_progress_lesson_id", "lesson_id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     lesson_id = db.Column(db.Integer, db.ForeignKey('lesson.id'), nullable=False)
     is_completed = db.Column(db.Boolean, default=False)
     completed_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)  # last state change, used for last-writer-wins
 
     student = db.relationship('User', back_populates='progress')
     lesson = db.relationship('Lesson', back_populates='progress')
 
 
+
+
+class LessonCompletionBitmap(db.Model):
+    """
+    Compact completion state: one row per (user, course)
+
+    bitmap: bit N set when the lesson with bit_index N is completed
+            (byte N // 8, bit N % 8)
+    completed_times: packed big-endian uint32 epoch seconds, one slot per
+            bit index (0 when not completed)
+    """
+    __tablename__ = "lesson_completion_bitmap"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "course_id", name="uq_completion_bitmap_user_course"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
+    bitmap = db.Column(db.LargeBinary, nullable=False, default=b"")
+    completed_times = db.Column(db.LargeBinary, nullable=False, default=b"")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class LessonPosition(db.Model):
+    """Last playback position per (user, lesson), written by the position buffer"""
+    __tablename__ = "lesson_positions"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "lesson_id", name="uq_lesson_position_user_lesson"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lesson.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Float, nullable=False, default=0.0)  # seconds
+    duration = db.Column(db.Float, nullable=True)  # seconds, as reported by the player
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
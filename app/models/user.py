@@ -3,6 +3,12 @@ from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(db.Model):
+    __table_args__ = (
+        # admin student directory: keyset pagination and name prefix search
+        db.Index("ix_user_role_created_at_id", "role", "created_at", "id"),
+        db.Index("ix_user_full_name", "full_name"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(120), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -60,6 +66,10 @@ class User(db.Model):
         }
 
 class Payment(db.Model):
+    __table_args__ = (
+        db.Index("ix_payment_user_status", "user_id", "status"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     amount = db.Column(db.Float, nullable=False)
@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify, request, render_template
+from flask import Blueprint, jsonify, request, render_template, Response, stream_with_context, current_app
 import requests
 import re
 from flask_jwt_extended import jwt_required, get_jwt_identity
@@ -9,9 +9,15 @@ from app.models.comment import ReportedComment
 from app.models.user import Payment
 from app.utils.mailer import send_email
 from sqlalchemy import func, extract
-from datetime import datetime
+from datetime import datetime, timedelta
 from app.extensions import db
-from app.helpers.currency import get_client_ip, get_country_from_ip, detect_currency    
+from app.helpers.currency import get_client_ip, get_country_from_ip, detect_currency, invalidate_exchange_rate
+from app.helpers.geoip import get_geoip_database
+from app.utils.auth import role_required
+from app.utils.cache import cache_stats
+from app.helpers.exports import EXPORTS, FORMATS, build_export_query, stream_rows
+from app.helpers.course_analytics import get_course_stats
+from app.helpers.course_outline import get_course_outline
 
 bp = Blueprint("admin", __name__)
 
@@ -124,6 +130,7 @@ def get_exchange_rate():
         rate = ExchangeRate(ngn_to_usd=1500)
         db.session.add(rate)
         db.session.commit()
+        invalidate_exchange_rate()
 
     return jsonify({
         "ngn_to_usd": rate.ngn_to_usd,
@@ -158,6 +165,7 @@ def update_exchange_rate():
         rate.updated_at = datetime.utcnow()
 
     db.session.commit()
+    invalidate_exchange_rate()
 
     return jsonify({
         "message": "Rate updated successfully",
@@ -185,14 +193,95 @@ def debug_currency():
     country, currency = get_country_from_ip(ip)
     detected = detect_currency()
 
+    geoip = get_geoip_database()
+
     return {
         "client_ip": ip,
         "api_raw": api_response,   # <-- add this
+        "geoip_country_code": geoip.lookup(ip) if geoip else None,
         "country": country,
         "api_currency": currency,
         "final_detected_currency": detected
     }
 
+@bp.route("/cache-stats", methods=["GET"])
+@jwt_required()
+@role_required("admin")
+def get_cache_stats():
+    """Hit/miss counters for the in-process caches (per worker)"""
+    return jsonify(cache_stats()), 200
+
+@bp.route("/exports/<kind>", methods=["GET"])
+@jwt_required()
+@role_required("admin")
+def export_data(kind):
+    """
+    Stream students, enrollments or payments
+
+    Query params:
+        format: ndjson (default) or csv
+        since / until: ISO dates filtering on the created/enrolled date
+        status: enrollment or payment status
+    """
+    if kind not in EXPORTS:
+        return jsonify({"error": f"Unknown export '{kind}'", "available": sorted(EXPORTS)}), 404
+
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in FORMATS:
+        return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+
+    try:
+        since = datetime.fromisoformat(request.args["since"]) if request.args.get("since") else None
+        until = datetime.fromisoformat(request.args["until"]) if request.args.get("until") else None
+    except ValueError:
+        return jsonify({"error": "since/until must be ISO dates"}), 400
+
+    query = build_export_query(kind, since=since, until=until, status=request.args.get("status"))
+    filename = f"{kind}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+
+    return Response(
+        stream_with_context(stream_rows(query, fmt)),
+        mimetype=FORMATS[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            # let nginx pass chunks straight through
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@bp.route("/courses/<int:course_id>/stats", methods=["GET"])
+@jwt_required()
+@role_required("admin")
+def get_course_statistics(course_id):
+    """
+    Completion funnel for a course, served from the stats snapshot only.
+    Snapshots are rebuilt by `flask stats refresh` (cron); stale is true when
+    the snapshot is missing or older than COURSE_STATS_MAX_AGE.
+    """
+    outline = get_course_outline(course_id)
+    if outline is None:
+        return jsonify({"error": "Course not found"}), 404
+
+    stats = get_course_stats(course_id) or {"course": None, "lessons": []}
+    max_age = current_app.config.get("COURSE_STATS_MAX_AGE", 3600)
+    refreshed_at = stats["course"]["refreshed_at"] if stats["course"] else None
+    stale = (
+        refreshed_at is None
+        or datetime.utcnow() - datetime.fromisoformat(refreshed_at) > timedelta(seconds=max_age)
+    )
+
+    for lesson in stats["lessons"]:
+        entry = outline["lessons"].get(lesson["lesson_id"])
+        lesson["title"] = entry["title"] if entry else None
+        lesson["section_name"] = entry["section_name"] if entry else None
+
+    return jsonify({
+        "course_id": course_id,
+        "title": outline["course"]["title"],
+        "stale": stale,
+        **stats
+    }), 200
+
 def is_valid_email(email: str) -> bool:
     pattern = r'^[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
@@ -6,9 +6,11 @@ from werkzeug.security import check_password_hash, generate_password_hash
 from datetime import timedelta
 from app.models.user import PendingUser, UserSession, Payment
 from app.models.enrollment import Enrollment
-from app.models.progress import Progress
-from app.models.comment import Comment
+from app.models.progress import Progress, LessonCompletionBitmap, LessonPosition
+from app.models.comment import Comment, CommentReaction
 from app.models.coupon import Coupon
+from app.helpers.comment_reactions import remove_user_reactions
+from app.helpers.comment_threads import invalidate_lesson_comments
 from datetime import datetime, timedelta
 from app.helpers.currency import get_client_ip
 from app.utils.mailer import send_email
@@ -474,10 +476,24 @@ def delete_account():
     if not user.check_password(password):
         return jsonify({"error": "Incorrect password"}), 401
 
+    # lessons whose cached comment pages change: the user's comments (and the
+    # replies cascading with them) plus every comment the user reacted to
+    reacted_ids = db.session.query(CommentReaction.comment_id).filter_by(user_id=user_id)
+    lesson_ids = [
+        lesson_id for (lesson_id,) in
+        db.session.query(Comment.lesson_id)
+        .filter((Comment.user_id == user_id) | Comment.id.in_(reacted_ids))
+        .distinct()
+    ]
+
     # Delete dependent rows first (to satisfy FK constraints)
+    # reactions go through the helper so other users' comments keep correct counts
+    remove_user_reactions(user_id)
     Payment.query.filter_by(user_id=user_id).delete()
     Enrollment.query.filter_by(user_id=user_id).delete()
     Progress.query.filter_by(user_id=user_id).delete()
+    LessonCompletionBitmap.query.filter_by(user_id=user_id).delete()
+    LessonPosition.query.filter_by(user_id=user_id).delete()
     Comment.query.filter_by(user_id=user_id).delete()
     Coupon.query.filter_by(user_id=user_id).delete()
     UserSession.query.filter_by(user_id=user_id).delete()
@@ -486,6 +502,7 @@ def delete_account():
     db.session.delete(user)
     db.session.commit()
 
+    invalidate_lesson_comments(*lesson_ids)
     return jsonify({"message": "Account deleted successfully"}), 200
 
 
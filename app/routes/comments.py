@@ -1,34 +1,34 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, request, jsonify, render_template, Response, stream_with_context, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.extensions import db
 from app.models import Comment, User
 from app.models.comment import ReportedComment
 from app.utils.mailer import send_email
+from app.helpers.comment_threads import (
+    DEFAULT_PREVIEW, MAX_PREVIEW, author_map, invalidate_lesson_comments, lesson_comment_page,
+    overlay_viewer_reactions, reply_page, serialize_comments, serialize_node
+)
+from app.helpers.comment_events import publish_comment_event, stream_events
+from app.helpers.comment_reactions import MAX_REACTION_LENGTH, reaction_counts, set_reaction
+from app.helpers.pagination import decode_cursor, parse_limit
 from datetime import datetime
 
 bp = Blueprint("comments", __name__)
 
-def serialize_comment(c, current_user_id=None):
-    user = User.query.get(c.user_id)
-    replies = Comment.query.filter_by(parent_id=c.id).order_by(Comment.created_at.asc()).all()
-
-    reacted_by_user = {}
-    if current_user_id and c.reactions:
-        for k in c.reactions.keys():
-            reacted_by_user[k] = False  # You can improve this later with a reaction table
-
-    return {
-        "id": c.id,
-        "lesson_id": c.lesson_id,
-        "author": user.full_name if user else "Unknown",
-        "role": user.role if user else None,
-        "avatar": user.profile_photo if user else None,
-        "text": c.content,
-        "timestamp": c.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-        "reactions": c.reactions or {},
-        "reactedByUser": reacted_by_user,
-        "replies": [serialize_comment(r, current_user_id) for r in replies]
-    }
+def comment_changed(lesson_id, kind, payload):
+    """Call after committing a comment write: drops cached pages and notifies live streams"""
+    invalidate_lesson_comments(lesson_id)
+    publish_comment_event(lesson_id, kind, payload)
+
+
+def parse_page_args(args):
+    """(cursor, limit, preview) from query params; raises ValueError on bad input"""
+    cursor = decode_cursor(args.get("cursor"), datetime, int)
+    limit = parse_limit(args.get("limit"), default=20, maximum=100)
+    preview = int(args.get("replies", DEFAULT_PREVIEW))
+    if preview < 0:
+        raise ValueError("replies must not be negative")
+    return cursor, limit, min(preview, MAX_PREVIEW)
 
 
 # --- Add comment ---
@@ -49,58 +49,110 @@ def add_comment():
         lesson_id=lesson_id,
         user_id=user_id,
         content=content,
-        parent_id=parent_id,
-        reactions={}
+        parent_id=parent_id
     )
 
     db.session.add(comment)
     db.session.commit()
 
-    return jsonify(serialize_comment(comment, user_id)), 201
+    # a new comment has no replies or reactions yet
+    data = serialize_node(comment, author_map([comment.user_id]))
+    comment_changed(comment.lesson_id, "created", data)
+
+    return jsonify(data), 201
 
 
-# --- List comments for a course ---
+# --- List comments for a lesson ---
 @bp.route("/course/<int:lesson_id>", methods=["GET"])
 @jwt_required(optional=True)
 def list_comments(lesson_id):
+    """
+    Top-level comments for a lesson, newest first
+
+    Query params:
+        limit: page size (default 20, max 100)
+        cursor: next_cursor from the previous page
+        replies: replies previewed per comment (default 3, max 10)
+    """
     current_user_id = get_jwt_identity()
 
-    comments = Comment.query.filter_by(
-        lesson_id=lesson_id,
-        parent_id=None
-    ).order_by(Comment.created_at.desc()).all()
+    try:
+        cursor, limit, preview = parse_page_args(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid limit, cursor or replies"}), 400
+
+    page = lesson_comment_page(lesson_id, cursor, limit, preview, current_user_id)
+    return jsonify(page), 200
+
+
+# --- Replies to a comment ---
+@bp.route("/<int:comment_id>/replies", methods=["GET"])
+@jwt_required(optional=True)
+def list_replies(comment_id):
+    """Direct replies to a comment, oldest first (same query params as list_comments)"""
+    current_user_id = get_jwt_identity()
+
+    try:
+        cursor, limit, preview = parse_page_args(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid limit, cursor or replies"}), 400
+
+    lesson_id = db.session.query(Comment.lesson_id).filter_by(id=comment_id).scalar()
+    if lesson_id is None:
+        return jsonify({"error": "Comment not found"}), 404
+
+    page = reply_page(lesson_id, comment_id, cursor, limit, preview, current_user_id)
+    return jsonify({"comment_id": comment_id, **page}), 200
+
+# --- Live updates for a lesson (Server-Sent Events) ---
+@bp.route("/stream/<int:lesson_id>", methods=["GET"])
+@jwt_required(optional=True)
+def stream_comments(lesson_id):
+    """
+    Pushes created / updated / deleted / reacted events for a lesson's comments.
+    Reconnecting clients resume from Last-Event-ID (header, or ?last_event_id=);
+    a `reset` event means events were missed and the thread should be reloaded.
+    """
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"error": "Invalid Last-Event-ID"}), 400
+
+    return Response(
+        stream_with_context(stream_events(current_app._get_current_object(), lesson_id, last_event_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-    return jsonify([
-        serialize_comment(c, current_user_id) for c in comments
-    ]), 200
 
 @bp.route("/<int:comment_id>/react", methods=["POST"])
 @jwt_required()
 def react_to_comment(comment_id):
-    user_id = str(get_jwt_identity())
+    user_id = int(get_jwt_identity())
     data = request.get_json() or {}
 
     new_reaction = data.get("reaction")
     if not new_reaction or not isinstance(new_reaction, str):
         return jsonify({"error": "Reaction type must be a string"}), 400
+    if len(new_reaction) > MAX_REACTION_LENGTH:
+        return jsonify({"error": "Reaction type is too long"}), 400
 
-    comment = Comment.query.get_or_404(comment_id)
+    lesson_id = db.session.query(Comment.lesson_id).filter_by(id=comment_id).scalar()
+    if lesson_id is None:
+        return jsonify({"error": "Comment not found"}), 404
 
-    previous_reaction = comment.user_reactions.get(user_id)
+    changed = set_reaction(user_id, comment_id, new_reaction)
+    if changed:
+        db.session.commit()
 
-    if previous_reaction:
-        comment.reactions[previous_reaction] = max(comment.reactions.get(previous_reaction, 1) - 1, 0)
-        if comment.reactions[previous_reaction] == 0:
-            del comment.reactions[previous_reaction]
-
-    comment.reactions[new_reaction] = comment.reactions.get(new_reaction, 0) + 1
-    comment.user_reactions[user_id] = new_reaction
-
-    db.session.commit()
+    reactions = reaction_counts([comment_id]).get(comment_id, {})
+    if changed:
+        comment_changed(lesson_id, "reacted", {"id": comment_id, "reactions": reactions})
 
     return jsonify({
         "message": f"Reaction updated to '{new_reaction}'",
-        "reactions": comment.reactions
+        "reactions": reactions
     }), 200
 
 
@@ -118,9 +170,12 @@ def edit_comment(comment_id):
     comment.content = data.get("content", comment.content)
     db.session.commit()
 
+    updated = serialize_comments([comment], DEFAULT_PREVIEW)[0]
+    comment_changed(comment.lesson_id, "updated", updated)
+
     return jsonify({
         "message": "Comment updated",
-        "comment": serialize_comment(comment, user_id)
+        "comment": overlay_viewer_reactions([updated], user_id)[0]
     }), 200
 
 @bp.route("/<int:comment_id>", methods=["DELETE"])
@@ -133,8 +188,10 @@ def delete_comment(comment_id):
     if comment.user_id != user_id:
         return jsonify({"error": "Unauthorized"}), 403
 
+    lesson_id, parent_id = comment.lesson_id, comment.parent_id
     db.session.delete(comment)
     db.session.commit()
+    comment_changed(lesson_id, "deleted", {"id": comment_id, "parent_id": parent_id})
 
     return jsonify({"message": "Comment deleted"}), 200
 
@@ -202,11 +259,12 @@ def report_comment(comment_id):
 @bp.route("/<int:comment_id>/reactions", methods=["GET"])
 @jwt_required(optional=True)
 def get_comment_reactions(comment_id):
-    comment = Comment.query.get_or_404(comment_id)
+    if not db.session.query(Comment.id).filter_by(id=comment_id).first():
+        return jsonify({"error": "Comment not found"}), 404
 
     return jsonify({
-        "comment_id": comment.id,
-        "reactions": comment.reactions or {
+        "comment_id": comment_id,
+        "reactions": reaction_counts([comment_id]).get(comment_id) or {
             "like": 0,
             "wow": 0,
             "love": 0,
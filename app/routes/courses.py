@@ -1,13 +1,28 @@
-from flask import Blueprint, request, jsonify, send_from_directory, current_app
+from flask import Blueprint, request, jsonify, send_from_directory, current_app, abort
 from app.extensions import db
 from werkzeug.utils import secure_filename
-from app.models import Course, Lesson, Enrollment
-from app.models.user import Payment, User
+from app.models import Course, Lesson
 from app.models.course import Section
 from app.models.lesson import Quiz
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.utils.auth import role_required
 from app.helpers.currency import detect_currency, convert_ngn_to_usd
+from app.helpers.catalog import get_catalog_snapshot
+from app.helpers.course_stats import lesson_totals_for, refresh_lesson_stats
+from app.helpers.progress_counters import rebuild_counters
+from app.helpers.completion_bitmap import allocate_bit_index
+from app.helpers.course_outline import (
+    get_course_outline,
+    get_lesson_course_id,
+    lesson_media,
+    invalidate_course_outline
+)
+from app.helpers.entitlements import get_course_access, can_access_course
+from app.helpers.search import search_courses
+from app.helpers.pagination import encode_cursor, decode_cursor, parse_limit, parse_bool, keyset_filter
+from app.utils.formatting import format_duration, format_size
+from sqlalchemy.orm import load_only
+from datetime import datetime
 import json
 from moviepy import VideoFileClip
 import os, uuid, re
@@ -46,25 +61,6 @@ def slugify(text):
     text = re.sub(r'[^a-zA-Z0-9]+', '-', text)
     return text.strip('-').lower()
 
-def format_duration(seconds):
-    """Convert float seconds to HH:MM:SS string."""
-    if not seconds:
-        return "00:00:00"
-    seconds = int(seconds)
-    hours, remainder = divmod(seconds, 3600)
-    minutes, secs = divmod(remainder, 60)
-    return f"{hours:02}:{minutes:02}:{secs:02}"
-
-def format_size(bytes_size):
-    """Convert bytes to human-readable GB/MB/KB."""
-    if not bytes_size:
-        return "0 KB"
-    for unit in ["B", "KB", "MB", "GB"]:
-        if bytes_size < 1024.0:
-            return f"{bytes_size:.2f} {unit}"
-        bytes_size /= 1024.0
-    return f"{bytes_size:.2f} TB"
-
 def trigger_hls_transcode(source_key, lesson_id):
     """Convert uploaded video to HLS adaptive streaming format"""
     mediaconvert = boto3.client(
@@ -370,6 +366,7 @@ def upload_to_s3_backend():
             lesson.document_url = file_url
         
         db.session.commit()
+        invalidate_course_outline(lesson.section.course_id)
         print(f"💾 Database updated for lesson #{lesson.id}")
         
         return jsonify({
@@ -463,7 +460,9 @@ def confirm_upload():
         lesson.s3_document_key = file_key
         lesson.document_url = file_url
     
+    refresh_lesson_stats(lesson.section.course_id)
     db.session.commit()
+    invalidate_course_outline(lesson.section.course_id)
     
     return jsonify({
         "message": "Upload confirmed successfully",
@@ -526,37 +525,84 @@ def mediaconvert_webhook():
         print(f"❌ Lesson {lesson_id} transcoding failed")
 
     db.session.commit()
+    invalidate_course_outline(lesson.section.course_id)
     return jsonify({"received": True}), 200
 
 # List all published courses
 @bp.route("/", methods=["GET"])
 def list_courses():
     user_currency = detect_currency()
-    courses = Course.query.filter_by(is_published=True).all()
-    result = []
-    for c in courses:
-        if user_currency == "USD":
-            price = convert_ngn_to_usd(c.price)
-        else:
-            price = c.price
+    snapshot = get_catalog_snapshot(user_currency)
 
-        result.append({
-            "id": c.id,
-            "image": c.image,
-            "slug": c.slug,
-            "title": c.title,
-            "description": c.description,
-            "price": price,
-            "currency": user_currency,
-            "is_published": c.is_published,
-            "total_lessons": c.total_lessons,
-            "created_at": c.created_at.isoformat()
-        })
-    return jsonify(result)
+    response = current_app.response_class(snapshot["body"], mimetype="application/json")
+    response.set_etag(snapshot["etag"])
+    # Currency depends on the client IP, so only the browser may reuse it
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+# Search published courses
+@bp.route("/search", methods=["GET"])
+def search_courses_route():
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"error": "Query parameter 'q' is required"}), 400
+
+    try:
+        limit = parse_limit(request.args.get("limit"), default=20, maximum=50)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    results = search_courses(query, limit=limit)
+    return jsonify({"query": query, "results": results, "count": len(results)})
 
 @bp.route("/admin", methods=["GET"])
 def list_courses_all():
-    courses = Course.query.all()
+    """
+    All courses (drafts included), newest first, with keyset pagination
+
+    Without limit or cursor the response stays the original bare list of every
+    matching course; pass either one to get {courses, has_more, next_cursor}.
+
+    Query params:
+        limit: page size (default 50, max 200)
+        cursor: next_cursor from the previous page
+        published: true/false to filter by publication status
+        q: title prefix
+        include_total: 1 to also return the total matching count (paginated only)
+    """
+    paginated = "limit" in request.args or "cursor" in request.args
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        cursor = decode_cursor(request.args.get("cursor"), datetime, int)
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    query = Course.query.options(load_only(
+        Course.id, Course.title, Course.description, Course.price,
+        Course.is_published, Course.created_at, Course.lesson_count, Course.total_duration
+    ))
+
+    published = parse_bool(request.args.get("published"))
+    if published is not None:
+        query = query.filter(Course.is_published == published)
+
+    title_prefix = (request.args.get("q") or "").strip()
+    if title_prefix:
+        query = query.filter(Course.title.startswith(title_prefix, autoescape=True))
+
+    query = query.order_by(Course.created_at.desc(), Course.id.desc())
+
+    if paginated:
+        total = query.count() if parse_bool(request.args.get("include_total")) else None
+        if cursor:
+            query = query.filter(keyset_filter(Course.created_at, Course.id, cursor))
+        courses = query.limit(limit + 1).all()
+        has_more = len(courses) > limit
+        courses = courses[:limit]
+    else:
+        courses = query.all()
+
+    totals = lesson_totals_for(courses)
     result = []
     for c in courses:
         result.append({
@@ -565,10 +611,23 @@ def list_courses_all():
             "description": c.description,
             "price": c.price,
             "is_published": c.is_published,
-            "total_lessons": c.total_lessons,
+            "total_lessons": totals[c.id][0],
+            "total_duration": totals[c.id][1],
             "created_at": c.created_at.isoformat()
         })
-    return jsonify(result)
+
+    if not paginated:
+        return jsonify(result)
+
+    response = {
+        "courses": result,
+        "has_more": has_more,
+        "next_cursor": encode_cursor(courses[-1].created_at, courses[-1].id) if has_more else None
+    }
+    if total is not None:
+        response["total"] = total
+
+    return jsonify(response)
 
 @bp.route("/<int:course_id>/publish", methods=["PATCH"])
 @jwt_required()
@@ -586,6 +645,7 @@ def publish_course(course_id):
         course.is_published = not course.is_published
     
     db.session.commit()
+    invalidate_course_outline(course.id, catalog=True)
     
     return jsonify({
         "message": f"Course {'published' if course.is_published else 'unpublished'} successfully",
@@ -599,75 +659,56 @@ def publish_course(course_id):
 @bp.route("/<int:course_id>", methods=["GET"])
 @jwt_required(optional=True)
 def get_course(course_id):
-    course = Course.query.get_or_404(course_id)
+    outline = get_course_outline(course_id)
+    if outline is None:
+        abort(404)
+
+    course = outline["course"]
     user_id = get_jwt_identity()
     user_currency = detect_currency()
 
-    is_paid = False
-    is_enrolled = False
-
-    if user_id:
-        enrollment = Enrollment.query.filter_by(
-            user_id=user_id,
-            course_id=course.id,
-            status="active"
-        ).first()
-
-        if enrollment:
-            is_enrolled = True
-
-        payment = (
-            Payment.query.join(
-                Enrollment, Enrollment.payment_reference == Payment.reference
-            )
-            .filter(
-                Payment.user_id == user_id,
-                Payment.status == "successful",
-                Enrollment.course_id == course.id
-            )
-            .first()
-        )
-
-        if payment:
-            is_paid = True
+    access = get_course_access(user_id, course_id)
+    is_paid = access["is_paid"]
+    is_enrolled = access["is_enrolled"]
 
     if user_currency == "USD":
-        price = convert_ngn_to_usd(course.price)
+        price = convert_ngn_to_usd(course["price"])
     else:
-        price = course.price
+        price = course["price"]
 
     response = {
-        "id": course.id,
-        "title": course.title,
-        "slug": course.slug,
-        "description": course.description,
-        "long_description": course.long_description,
+        "id": course["id"],
+        "title": course["title"],
+        "slug": course["slug"],
+        "description": course["description"],
+        "long_description": course["long_description"],
         "price": price,
         "currency": user_currency,
-        "is_published": course.is_published,
-        "total_lessons": course.total_lessons,
-        "created_at": course.created_at.isoformat(),
-        "image": course.image,
+        "is_published": course["is_published"],
+        "total_lessons": course["total_lessons"],
+        "total_duration": course["total_duration"],
+        "created_at": course["created_at"],
+        "image": course["image"],
         "sections": [],
         "user_id": user_id,
         "is_enrolled": is_enrolled,
         "is_paid": is_paid
     }
 
-    for section in course.sections:
+    for section in outline["sections"]:
         sub_data = {
-            "id": section.id,
-            "name": section.name,
-            "description": section.description,
+            "id": section["id"],
+            "name": section["name"],
+            "description": section["description"],
             "lessons": []
         }
 
-        for lesson in section.lessons:
+        for lesson in section["lessons"]:
             lesson_data = {
-                "id": lesson.id,
-                "title": lesson.title,
-                "duration": lesson.duration,
-                "size": lesson.size
+                "id": lesson["id"],
+                "title": lesson["title"],
+                "duration": lesson["duration"],
+                "size": lesson["size"]
             }
             sub_data["lessons"].append(lesson_data)
 
@@ -678,116 +719,49 @@ def get_course(course_id):
 @bp.route("/<int:course_id>/full", methods=["GET"])
 @jwt_required(optional=True)
 def get_full_course(course_id):
-    course = Course.query.get_or_404(course_id)
+    outline = get_course_outline(course_id)
+    if outline is None:
+        abort(404)
+
+    course = outline["course"]
     user_id = get_jwt_identity()
 
-    is_admin = False
-    has_access = False
-    
-    if user_id:
-        user = User.query.get(user_id)
-        if user and user.role == "admin":
-            is_admin = True
-            has_access = True  # Admins always have access
-        else:
-            # Check enrollment and payment for non-admin users
-            enrollment = Enrollment.query.filter_by(
-                user_id=user_id,
-                course_id=course.id,
-                status="active"
-            ).first()
-
-            if enrollment:
-                payment = (
-                    Payment.query.join(
-                        Enrollment, Enrollment.payment_reference == Payment.reference
-                    )
-                    .filter(
-                        Payment.user_id == user_id,
-                        Payment.status == "successful",
-                        Enrollment.course_id == course.id
-                    )
-                    .first()
-                )
-                if payment:
-                    has_access = True
+    # Admins always have access; students need an active, paid enrollment
+    access = get_course_access(user_id, course_id)
+    is_admin = access["is_admin"]
+    has_access = access["has_access"]
 
     course_data = {
-        "id": course.id,
-        "title": course.title,
-        "slug": getattr(course, "slug", None),
-        "description": course.description,
-        "long_description": course.long_description,
-        "price": course.price,
-        "is_published": course.is_published,
-        "total_lessons": course.total_lessons,
-        "created_at": course.created_at.isoformat(),
-        "image": course.image,
+        **course,
         "has_access": has_access,  # ✅ Tell frontend if user has access
         "is_admin": is_admin,      # ✅ Tell frontend if user is admin
         "sections": []
     }
 
-    cloudfront_domain = os.getenv('CLOUDFRONT_DOMAIN')
-
-    for section in course.sections:
+    for section in outline["sections"]:
         section_data = {
-            "id": section.id,
-            "name": section.name,
-            "slug": section.slug,
-            "description": section.description,
+            "id": section["id"],
+            "name": section["name"],
+            "slug": section["slug"],
+            "description": section["description"],
             "lessons": []
         }
 
-        for lesson in section.lessons:
+        for lesson in section["lessons"]:
             lesson_data = {
-                "id": lesson.id,
-                "title": lesson.title,
-                "slug": lesson.slug,
-                "notes": lesson.notes,
-                "reference_link": lesson.reference_link,
-                "duration": format_duration(lesson.duration),
-                "size": format_size(lesson.size),
-                "created_at": lesson.created_at.isoformat(),
-                "quizzes": []
+                "id": lesson["id"],
+                "title": lesson["title"],
+                "slug": lesson["slug"],
+                "notes": lesson["notes"],
+                "reference_link": lesson["reference_link"],
+                "duration": lesson["duration_display"],
+                "size": lesson["size_display"],
+                "created_at": lesson["created_at"],
+                # ✅ Only show video/document URLs if user has access (paid or admin)
+                **lesson_media(lesson, has_access),
+                "quizzes": list(lesson["quizzes"])
             }
 
-            # ✅ Only show video/document URLs if user has access (paid or admin)
-            if has_access:
-                if lesson.hls_key and lesson.transcode_status == "complete":
-                    # Serve HLS playlist via CloudFront (no presigned needed if CF is configured)
-                    lesson_data["video_url"] = f"https://{cloudfront_domain}/{lesson.hls_key}"
-                    lesson_data["video_type"] = "application/x-mpegURL"  # Tell frontend it's HLS
-                elif lesson.s3_video_key:
-                    # Fallback to raw video while transcoding or if HLS failed
-                    lesson_data["video_url"] = generate_presigned_url(lesson.s3_video_key, expiration=7200)
-                    lesson_data["video_type"] = "video/mp4"
-                else:
-                    lesson_data["video_url"] = None
-                
-                if lesson.s3_document_key:
-                    # Generate presigned URL for S3 documents
-                    presigned_url = generate_presigned_url(lesson.s3_document_key, expiration=7200)
-                    lesson_data["document_url"] = presigned_url
-                else:
-                    lesson_data["document_url"] = lesson.document_url
-            else:
-                # Free users see null URLs
-                lesson_data["video_url"] = None
-                lesson_data["document_url"] = None
-
-            # ✅ Include quizzes
-            if hasattr(lesson, 'quizzes') and lesson.quizzes:
-                for quiz in lesson.quizzes:
-                    lesson_data["quizzes"].append({
-                        "id": quiz.id,
-                        "question": quiz.question,
-                        "options": quiz.options,
-                        "correct_answer": quiz.correct_answer,
-                        "quiz_type": quiz.quiz_type,
-                        "explanation": quiz.explanation
-                    })
-
             section_data["lessons"].append(lesson_data)
 
         course_data["sections"].append(section_data)
@@ -819,6 +793,7 @@ def create_course():
     )
     db.session.add(new_course)
     db.session.commit()
+    invalidate_course_outline(new_course.id, catalog=True)
 
     return jsonify({
         "message": "Course created successfully",
@@ -922,11 +897,15 @@ def update_course(course_id):
                     document_url=doc_path,
                     duration=duration,
                     size=size,
-                    section=section
+                    section=section,
+                    bit_index=allocate_bit_index(course.id)
                 )
                 db.session.add(lesson)
 
+    refresh_lesson_stats(course.id)
+    rebuild_counters(course.id)
     db.session.commit()
+    invalidate_course_outline(course.id, catalog=True)
 
     return jsonify({"message": "✅ Course and related data updated successfully"}), 200
 
@@ -944,7 +923,10 @@ def delete_section(course_id, section_id):
 
     # Deleting section will also delete lessons if cascade is set in the model
     db.session.delete(section)
+    refresh_lesson_stats(course.id)
+    rebuild_counters(course.id)
     db.session.commit()
+    invalidate_course_outline(course.id, catalog=True)
 
     return jsonify({
         "message": "Section deleted successfully",
@@ -999,11 +981,15 @@ def create_lesson(course_id, section_id):
         slug=slugify(title),
         notes=data.get("notes", ""),
         reference_link=data.get("reference_link", ""),
-        section=section
+        section=section,
+        bit_index=allocate_bit_index(course_id)
     )
 
     db.session.add(new_lesson)
+    refresh_lesson_stats(course_id)
+    rebuild_counters(course_id)
     db.session.commit()
+    invalidate_course_outline(course_id, catalog=True)
 
     return jsonify({
         "message": "Lesson created successfully",
@@ -1119,6 +1105,7 @@ def update_lesson(lesson_id):
 
     # -------- SAVE CHANGES --------
     db.session.commit()
+    invalidate_course_outline(lesson.section.course_id)
 
 
     return jsonify({
@@ -1140,98 +1127,43 @@ def update_lesson(lesson_id):
 @bp.route("/lessons/<int:lesson_id>", methods=["GET"])
 @jwt_required(optional=True)
 def get_lesson_details(lesson_id):
-    lesson = Lesson.query.get_or_404(lesson_id)
-    user_id = get_jwt_identity()
+    course_id = get_lesson_course_id(lesson_id)
+    outline = get_course_outline(course_id) if course_id else None
+    lesson = outline["lessons"].get(lesson_id) if outline else None
+    if lesson is None:
+        abort(404)
 
-    # ✅ Check if user is admin
-    is_admin = False
-    has_access = False
+    user_id = get_jwt_identity()
 
-    if user_id:
-        from app.models.user import User
-        user = User.query.get(user_id)
-        if user and user.role == "admin":
-            is_admin = True
-            has_access = True  # Admins always have access
-        else:
-            # Check enrollment and payment for non-admin users
-            enrollment = Enrollment.query.filter_by(
-                user_id=user_id,
-                course_id=lesson.section.course_id,
-                status="active"
-            ).first()
-
-            if enrollment:
-                payment = (
-                    Payment.query.join(
-                        Enrollment, Enrollment.payment_reference == Payment.reference
-                    )
-                    .filter(
-                        Payment.user_id == user_id,
-                        Payment.status == "successful",
-                        Enrollment.course_id == lesson.section.course_id
-                    )
-                    .first()
-                )
-                if payment:
-                    has_access = True
+    # Admins always have access; students need an active, paid enrollment
+    access = get_course_access(user_id, course_id)
+    is_admin = access["is_admin"]
+    has_access = access["has_access"]
 
     lesson_data = {
-        "id": lesson.id,
-        "title": lesson.title,
-        "slug": lesson.slug,
-        "notes": lesson.notes,
-        "reference_link": lesson.reference_link,
-        "duration": format_duration(lesson.duration) if lesson.duration else "00:00:00",  # ✅ ADDED
-        "size": format_size(lesson.size) if lesson.size else "0 KB",  # ✅ ADDED
-        "created_at": lesson.created_at.isoformat(),
+        "id": lesson["id"],
+        "title": lesson["title"],
+        "slug": lesson["slug"],
+        "notes": lesson["notes"],
+        "reference_link": lesson["reference_link"],
+        "duration": lesson["duration_display"],  # ✅ ADDED
+        "size": lesson["size_display"],  # ✅ ADDED
+        "created_at": lesson["created_at"],
         "has_access": has_access,  # ✅ Tell frontend if user has access
         "is_admin": is_admin,      # ✅ Tell frontend if user is admin
         "section": {
-            "id": lesson.section.id,
-            "name": lesson.section.name,
-            "course_id": lesson.section.course_id
-        } if lesson.section else None,
-        "quizzes": []
+            "id": lesson["section_id"],
+            "name": lesson["section_name"],
+            "course_id": course_id
+        },
+        # Show video/document URLs if user has access (paid or admin)
+        **lesson_media(lesson, has_access),
+        "quizzes": list(lesson["quizzes"])
     }
 
-    # Show video/document URLs if user has access (paid or admin)
-    cloudfront_domain = os.getenv('CLOUDFRONT_DOMAIN')
-    if has_access:
-        if lesson.hls_key and lesson.transcode_status == "complete":
-        # Serve HLS playlist via CloudFront (no presigned needed if CF is configured)
-            lesson_data["video_url"] = f"https://{cloudfront_domain}/{lesson.hls_key}"
-            lesson_data["video_type"] = "application/x-mpegURL"  # Tell frontend it's HLS
-        elif lesson.s3_video_key:
-        # Fallback to raw video while transcoding or if HLS failed
-            lesson_data["video_url"] = generate_presigned_url(lesson.s3_video_key, expiration=7200)
-            lesson_data["video_type"] = "video/mp4"
-        else:
-            lesson_data["video_url"] = None
-        
-        if lesson.s3_document_key:
-            presigned_url = generate_presigned_url(lesson.s3_document_key, expiration=7200)
-            lesson_data["document_url"] = presigned_url
-        else:
-            lesson_data["document_url"] = lesson.document_url
-    else:
-        lesson_data["video_url"] = None
-        lesson_data["document_url"] = None
-        # Only show access denied if user is logged in but not paid (and not admin)
-        if user_id and not is_admin:
-            lesson_data["access_denied"] = "Please enroll and complete payment to access this content"
-
-    # ✅ Include quizzes
-    if hasattr(lesson, "quizzes") and lesson.quizzes:
-        for quiz in lesson.quizzes:
-            lesson_data["quizzes"].append({
-                "id": quiz.id,
-                "question": quiz.question,
-                "options": quiz.options,
-                "correct_answer": quiz.correct_answer,
-                "quiz_type": quiz.quiz_type,  # ✅ ADDED (was missing)
-                "explanation": quiz.explanation
-            })
+    # Only show access denied if user is logged in but not paid (and not admin)
+    if not has_access and user_id and not is_admin:
+        lesson_data["access_denied"] = "Please enroll and complete payment to access this content"
 
     return jsonify(lesson_data), 200
 
@@ -1259,7 +1191,10 @@ def delete_lesson(course_id, section_id, lesson_id):
     # Delete the lesson from database
     lesson_title = lesson.title
     db.session.delete(lesson)
+    refresh_lesson_stats(course_id)
+    rebuild_counters(course_id)
     db.session.commit()
+    invalidate_course_outline(course_id, catalog=True)
 
     return jsonify({
         "message": "Lesson deleted successfully",
@@ -1309,6 +1244,7 @@ def add_quiz(course_id, lesson_id):
 
     db.session.add(quiz)
     db.session.commit()
+    invalidate_course_outline(course_id)
 
     return jsonify({
         "message": "Quiz added successfully",
@@ -1347,6 +1283,7 @@ def update_quiz(lesson_id, quiz_id):
         return jsonify({"error": f"Invalid quiz type. Must be one of {valid_types}"}), 400
 
     db.session.commit()
+    invalidate_course_outline(quiz.lesson.section.course_id)
 
     return jsonify({
         "message": "Quiz updated successfully",
@@ -1369,8 +1306,10 @@ def delete_quiz(lesson_id, quiz_id):
     if quiz.lesson_id != lesson_id:
         return jsonify({"error": "Quiz does not belong to this lesson"}), 400
 
+    course_id = quiz.lesson.section.course_id
     db.session.delete(quiz)
     db.session.commit()
+    invalidate_course_outline(course_id)
 
     return jsonify({"message": "Quiz deleted successfully"}), 200
 
@@ -1387,30 +1326,7 @@ def download_lesson_document(lesson_id):
     
     user_id = get_jwt_identity()
     
-    has_access = False
-    if user_id:
-        enrollment = Enrollment.query.filter_by(
-            user_id=user_id,
-            course_id=lesson.section.course_id,
-            status="active"
-        ).first()
-
-        if enrollment:
-            payment = (
-                Payment.query.join(
-                    Enrollment, Enrollment.payment_reference == Payment.reference
-                )
-                .filter(
-                    Payment.user_id == user_id,
-                    Payment.status == "successful",
-                    Enrollment.course_id == lesson.section.course_id
-                )
-                .first()
-            )
-            if payment:
-                has_access = True
-    
-    if not has_access:
+    if not can_access_course(user_id, lesson.section.course_id):
         return jsonify({"error": "Access denied. Please enroll and complete payment."}), 403
     
     if lesson.s3_document_key:
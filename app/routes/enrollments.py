@@ -8,6 +8,7 @@ import uuid
 import random
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.utils.mailer import send_email
+from app.helpers.entitlements import invalidate_access
 
 bp = Blueprint("enrollment", __name__)
 
@@ -97,8 +98,10 @@ def enroll_course(course_id):
         # If status is 'paid' or 'pending', just activate it instead of creating new
         if existing.status in ["paid", "pending"]:
             existing.status = "active"
-            existing.progress = 0.0
+            # counters are rebuilt from Progress on the next completion
+            existing.completed_lessons = None
             db.session.commit()
+            invalidate_access(user_id, course.id)
 
             return jsonify({
                 "message": "Enrollment reactivated",
@@ -121,6 +124,7 @@ def enroll_course(course_id):
 
     db.session.add(new_enrollment)
     db.session.commit()
+    invalidate_access(user_id, course.id)
 
     has_password = bool(user.password_hash and user.password_hash.strip())
 
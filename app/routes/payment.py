@@ -8,6 +8,7 @@ from app.models import Enrollment, User, Course
 from app.models.coupon import Coupon
 from app.models.user import Payment
 from app.helpers.currency import detect_currency, convert_ngn_to_usd, get_client_ip
+from app.helpers.entitlements import invalidate_access
 
 bp = Blueprint("payments", __name__)
 
@@ -243,6 +244,7 @@ def verify_payment():
                 coupon.used_count = (coupon.used_count or 0) + 1
 
         db.session.commit()
+        invalidate_access(payment.user_id, payment.course_id)
         return redirect(f"{redirect_url}?payment_status=success&reference={reference}")
 
     elif pay_status == "failed":
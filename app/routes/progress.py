@@ -1,11 +1,43 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.extensions import db
 from app.models import Progress
+from app.models.progress import LessonPosition
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from app.helpers.progress_counters import apply_completion_change
+from app.helpers.completion_bitmap import record_lesson_states
+from app.helpers.course_outline import get_course_outline, get_lesson_course_id
+from app.helpers.position_buffer import position_buffer
+from app.helpers.course_progress import apply_progress_events, completion_map, summarize_progress
+from app.helpers.pagination import parse_bool
+from datetime import datetime, timezone
 
 bp = Blueprint("progress", __name__)
 
+MAX_BATCH_EVENTS = 500
+
+
+def _parse_event_time(value, now):
+    """ISO timestamp -> naive UTC datetime, clamped to now (client clocks drift)"""
+    if not value:
+        return now
+    at = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(at, now)
+
+
+def _parse_completed(value):
+    """JSON bool or 'true'/'false'/'1'/'0' string; missing means completed"""
+    if value is None:
+        return True
+    if isinstance(value, bool):
+        return value
+    parsed = parse_bool(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise ValueError("completed must be a boolean")
+    return parsed
+
 # Mark lesson complete
 @bp.route("/complete", methods=["POST"])
 @jwt_required()
@@ -22,20 +54,40 @@ def mark_complete():
         lesson_id=lesson_id
     ).first()
 
+    flipped = 0
+    if not progress:
+        db.session.add(Progress(
+            user_id=user_id,
+            lesson_id=lesson_id,
+            is_completed=True,
+            completed_at=datetime.utcnow(),
+            updated_at=datetime.utcnow()
+        ))
+        try:
+            db.session.flush()
+            flipped = 1
+        except IntegrityError:
+            # a concurrent request (double-click, retry) inserted the row first
+            db.session.rollback()
+            progress = Progress.query.filter_by(user_id=user_id, lesson_id=lesson_id).first()
+
     # If already exists, update it
     if progress:
         if progress.is_completed:
             return jsonify({"message": "Lesson already marked as complete"}), 200
-        progress.is_completed = True
-        progress.completed_at = datetime.utcnow()
-    else:
-        progress = Progress(
-            user_id=user_id,
-            lesson_id=lesson_id,
-            is_completed=True,
-            completed_at=datetime.utcnow()
-        )
-        db.session.add(progress)
+        # conditional update so concurrent requests only count the lesson once
+        flipped = Progress.query.filter(
+            Progress.id == progress.id,
+            Progress.is_completed.isnot(True)
+        ).update({
+            "is_completed": True,
+            "completed_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        }, synchronize_session=False)
+
+    if flipped:
+        apply_completion_change(user_id, lesson_id, 1)
+        record_lesson_states(user_id, {lesson_id: datetime.utcnow()})
 
     db.session.commit()
     return jsonify({"message": "Lesson marked as complete"}), 200
@@ -58,10 +110,127 @@ def uncomplete_lesson():
     if not progress:
         return jsonify({"error": "Progress record not found"}), 404
 
-    progress.is_completed = False
-    progress.completed_at = None
+    flipped = Progress.query.filter(
+        Progress.id == progress.id,
+        Progress.is_completed.is_(True)
+    ).update({
+        "is_completed": False,
+        "completed_at": None,
+        "updated_at": datetime.utcnow()
+    }, synchronize_session=False)
+
+    if flipped:
+        apply_completion_change(user_id, lesson_id, -1)
+        record_lesson_states(user_id, {lesson_id: None})
 
     db.session.commit()
 
     return jsonify({"message": "Lesson marked as incomplete"}), 200
 
+
+# Replay offline progress in one request
+@bp.route("/batch", methods=["POST"])
+@jwt_required()
+def sync_progress_batch():
+    """
+    Body: {"events": [{"lesson_id": 1, "completed": true, "completed_at": "2025-01-01T10:00:00Z"}, ...]}
+    The event time is completed_at (or updated_at for un-completions); the
+    latest write per lesson wins.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    raw_events = data.get("events")
+
+    if not isinstance(raw_events, list) or not raw_events:
+        return jsonify({"error": "events must be a non-empty list"}), 400
+
+    if len(raw_events) > MAX_BATCH_EVENTS:
+        return jsonify({"error": f"At most {MAX_BATCH_EVENTS} events per batch"}), 400
+
+    now = datetime.utcnow()
+    events = []
+    for index, event in enumerate(raw_events):
+        try:
+            events.append((
+                int(event["lesson_id"]),
+                _parse_completed(event.get("completed")),
+                _parse_event_time(event.get("completed_at") or event.get("updated_at"), now)
+            ))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return jsonify({"error": f"Invalid event at index {index}"}), 400
+
+    try:
+        result = apply_progress_events(user_id, events)
+        db.session.commit()
+    except IntegrityError:
+        # a concurrent request inserted one of the rows first - replay against it
+        db.session.rollback()
+        result = apply_progress_events(user_id, events)
+        db.session.commit()
+
+    courses = []
+    for course_id in result["course_ids"]:
+        outline = get_course_outline(course_id)
+        if outline is None:
+            continue
+        courses.append({
+            "course_id": course_id,
+            **summarize_progress(outline, completion_map(user_id, course_id))
+        })
+
+    return jsonify({
+        "applied": result["applied"],
+        "ignored": result["ignored"],
+        "unknown_lessons": result["unknown_lessons"],
+        "courses": courses
+    }), 200
+
+# Playback position heartbeat
+@bp.route("/position", methods=["POST"])
+@jwt_required()
+def save_position():
+    """
+    Body: {"lesson_id": 1, "position": 93.5, "duration": 600}
+    Buffered in memory and written in batches; see app.helpers.position_buffer
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+
+    try:
+        lesson_id = int(data["lesson_id"])
+        position = float(data["position"])
+        duration = float(data["duration"]) if data.get("duration") is not None else None
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "lesson_id and position are required"}), 400
+
+    if position < 0 or (duration is not None and duration < 0):
+        return jsonify({"error": "position and duration must not be negative"}), 400
+
+    if get_lesson_course_id(lesson_id) is None:
+        return jsonify({"error": "Lesson not found"}), 404
+
+    position_buffer.add(current_app._get_current_object(), user_id, lesson_id, position, duration)
+    return jsonify({"message": "Position saved"}), 202
+
+
+@bp.route("/position/<int:lesson_id>", methods=["GET"])
+@jwt_required()
+def get_position(lesson_id):
+    user_id = int(get_jwt_identity())
+
+    # this worker may hold a newer position than the database
+    buffered = position_buffer.get(user_id, lesson_id)
+    if buffered is not None:
+        position, duration, updated_at = buffered
+    else:
+        row = LessonPosition.query.filter_by(user_id=user_id, lesson_id=lesson_id).first()
+        if row is None:
+            return jsonify({"lesson_id": lesson_id, "position": 0, "duration": None, "updated_at": None}), 200
+        position, duration, updated_at = row.position, row.duration, row.updated_at
+
+    return jsonify({
+        "lesson_id": lesson_id,
+        "position": position,
+        "duration": duration,
+        "updated_at": updated_at.isoformat() if updated_at else None
+    }), 200
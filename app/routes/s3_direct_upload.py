@@ -136,6 +136,8 @@ def confirm_upload():
     """
     from app.models import Lesson
     from app.extensions import db
+    from app.helpers.course_stats import refresh_lesson_stats
+    from app.helpers.course_outline import invalidate_course_outline
     
     data = request.get_json()
     
@@ -166,7 +168,9 @@ def confirm_upload():
         lesson.s3_document_key = file_key
         lesson.document_url = file_url
     
+    refresh_lesson_stats(lesson.section.course_id)
     db.session.commit()
+    invalidate_course_outline(lesson.section.course_id)
     
     return jsonify({
         "message": "Upload confirmed successfully",
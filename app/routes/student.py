@@ -1,11 +1,19 @@
-from flask import Blueprint, jsonify, request, send_file, current_app, render_template, url_for
+from flask import Blueprint, jsonify, request, send_file, current_app, render_template, url_for, abort
 import uuid
 import io
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import UserSession, Payment
 from app.extensions import db
-from app.models import User, Enrollment, Course, Progress
+from app.models import User, Enrollment, Course, Progress, Lesson
+from app.models.course import Section
 from app.utils.auth import role_required
+from app.helpers.entitlements import invalidate_access
+from app.helpers.course_outline import get_course_outline
+from app.helpers.course_progress import completion_map, summarize_progress, completed_counts_for
+from app.helpers.course_stats import total_lessons_for
+from app.helpers.pagination import encode_cursor, decode_cursor, parse_limit, parse_bool, keyset_filter
+from sqlalchemy import case, distinct, func, or_
+from sqlalchemy.orm import joinedload, load_only, selectinload
 import os
 import json
 from werkzeug.utils import secure_filename
@@ -27,27 +35,94 @@ UPLOAD_FOLDER = os.path.join("static", "uploads", "profile_photos")
 @jwt_required()
 @role_required("admin")
 def get_all_students():
-    students = User.query.filter_by(role="student").all()
-    result = []
+    """
+    Student directory with keyset pagination
+
+    Query params:
+        limit: page size (default 50, max 200)
+        cursor: next_cursor from the previous page
+        q: email or name prefix
+        sort: joined (default) or enrollments
+        order: desc (default) or asc
+        include_total: 0 to skip counting total_students (returned by default)
+    """
+    sort = request.args.get("sort", "joined")
+    descending = request.args.get("order", "desc") != "asc"
+    if sort not in ("joined", "enrollments"):
+        return jsonify({"error": "sort must be 'joined' or 'enrollments'"}), 400
+
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        cursor = decode_cursor(request.args.get("cursor"), datetime if sort == "joined" else int, int)
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    query = (
+        db.session.query(User)
+        .options(
+            load_only(User.id, User.full_name, User.email, User.is_active, User.created_at),
+            selectinload(User.enrollments)
+            .load_only(Enrollment.id, Enrollment.course_id)
+            .joinedload(Enrollment.course)
+            .load_only(Course.id, Course.title)
+        )
+        .filter(User.role == "student")
+    )
+
+    search = (request.args.get("q") or "").strip()
+    if search:
+        query = query.filter(or_(
+            User.email.startswith(search.lower(), autoescape=True),
+            User.full_name.startswith(search, autoescape=True)
+        ))
+
+    # total_students was always returned; skipping the COUNT is opt-out
+    total = query.count() if parse_bool(request.args.get("include_total")) is not False else None
+
+    if sort == "enrollments":
+        counts = (
+            db.session.query(Enrollment.user_id, func.count(Enrollment.id).label("enrollments"))
+            .group_by(Enrollment.user_id)
+            .subquery()
+        )
+        sort_column = func.coalesce(counts.c.enrollments, 0)
+        query = query.outerjoin(counts, counts.c.user_id == User.id).add_columns(sort_column)
+    else:
+        sort_column = User.created_at
+        query = query.add_columns(User.created_at)
+
+    if cursor:
+        query = query.filter(keyset_filter(sort_column, User.id, cursor, descending))
+
+    order = (sort_column.desc(), User.id.desc()) if descending else (sort_column.asc(), User.id.asc())
+    rows = query.order_by(*order).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
 
-    for s in students:
+    result = []
+    for s, _ in rows:
         # Collect course titles for this student
         course_titles = [enrollment.course.title for enrollment in s.enrollments if enrollment.course]
 
         result.append({
             "id": s.id,
-            "name": s.full_name,  # Assuming your User model has a full_name property
+            "name": s.full_name,
             "email": s.email,
             "is_active": s.is_active,
             "date_joined": s.created_at,
             "courses_enrolled": len(course_titles),
-            "course_titles": course_titles 
+            "course_titles": course_titles
         })
 
-    return jsonify({
-        "total_students": len(result),
-        "students": result
-    }), 200
+    response = {
+        "students": result,
+        "has_more": has_more,
+        "next_cursor": encode_cursor(rows[-1][1], rows[-1][0].id) if has_more else None
+    }
+    if total is not None:
+        response["total_students"] = total
+
+    return jsonify(response), 200
 
 
 
@@ -55,24 +130,104 @@ def get_all_students():
 @jwt_required()
 @role_required("admin")
 def get_students_by_course(course_id):
-    enrollments = Enrollment.query.filter_by(course_id=course_id).all()
-    if not enrollments:
-        return jsonify({"message": "No students enrolled in this course"}), 404
+    """
+    Course roster with progress from one aggregate query
+
+    Query params:
+        limit / cursor: keyset pagination
+        sort: progress (default), enrolled or last_activity
+        order: desc (default) or asc
+        status: only enrollments with this status
+        include_total: 0 to skip counting total_students (returned by default)
+    """
+    course = Course.query.get_or_404(course_id)
+
+    sort = request.args.get("sort", "progress")
+    descending = request.args.get("order", "desc") != "asc"
+    if sort not in ("progress", "enrolled", "last_activity"):
+        return jsonify({"error": "sort must be 'progress', 'enrolled' or 'last_activity'"}), 400
+
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        cursor = decode_cursor(request.args.get("cursor"), int if sort == "progress" else datetime, int)
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    # completed lessons and latest activity per user, for this course only
+    activity = (
+        db.session.query(
+            Progress.user_id.label("user_id"),
+            func.count(distinct(case((Progress.is_completed.is_(True), Progress.lesson_id)))).label("completed"),
+            func.max(func.coalesce(Progress.updated_at, Progress.completed_at)).label("last_activity")
+        )
+        .join(Lesson, Lesson.id == Progress.lesson_id)
+        .join(Section, Section.id == Lesson.section_id)
+        .filter(Section.course_id == course_id)
+        .group_by(Progress.user_id)
+        .subquery()
+    )
+
+    completed = func.coalesce(activity.c.completed, 0)
+    sort_columns = {
+        "progress": completed,
+        "enrolled": Enrollment.enrolled_at,
+        # students who never opened a lesson count as active when they enrolled
+        "last_activity": func.coalesce(activity.c.last_activity, Enrollment.enrolled_at),
+    }
+    sort_column = sort_columns[sort]
+
+    query = (
+        db.session.query(
+            Enrollment.id, Enrollment.status, Enrollment.enrolled_at,
+            User.id, User.full_name, User.email,
+            completed, activity.c.last_activity, sort_column
+        )
+        .join(User, User.id == Enrollment.user_id)
+        .outerjoin(activity, activity.c.user_id == Enrollment.user_id)
+        .filter(Enrollment.course_id == course_id)
+    )
+
+    status = request.args.get("status")
+    if status:
+        query = query.filter(Enrollment.status == status)
+
+    # total_students was always returned; skipping the COUNT is opt-out
+    total = query.count() if parse_bool(request.args.get("include_total")) is not False else None
+
+    if cursor:
+        query = query.filter(keyset_filter(sort_column, Enrollment.id, cursor, descending))
+
+    order = (sort_column.desc(), Enrollment.id.desc()) if descending else (sort_column.asc(), Enrollment.id.asc())
+    rows = query.order_by(*order).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    total_lessons = total_lessons_for([course])[course.id]
 
     students = []
-    for e in enrollments:
+    for enrollment_id, enrollment_status, enrolled_at, student_id, name, email, done, last_activity, _ in rows:
         students.append({
-            "student_id": e.student.id,
-            "student_name": e.student.name,
-            "email": e.student.email,
-            "progress": e.progress,
-            "enrolled_on": e.enrolled_on
+            "student_id": student_id,
+            "student_name": name,
+            "email": email,
+            "status": enrollment_status,
+            "enrolled_on": enrolled_at.isoformat() if enrolled_at else None,
+            "completed_lessons": done,
+            "progress": round((done / total_lessons) * 100, 2) if total_lessons > 0 else 0,
+            "last_activity": last_activity.isoformat() if last_activity else None
         })
-    return jsonify({
+
+    response = {
         "course_id": course_id,
-        "total_students": len(students),
-        "students": students
-    }), 200
+        "total_lessons": total_lessons,
+        "students": students,
+        "has_more": has_more,
+        "next_cursor": encode_cursor(rows[-1][-1], rows[-1][0]) if has_more else None
+    }
+    if total is not None:
+        response["total_students"] = total
+
+    return jsonify(response), 200
 
 
 @bp.route("/<int:student_id>", methods=["GET"])
@@ -127,6 +282,7 @@ def update_student_status(student_id):
         message = f"Student {student.full_name} has been activated."
 
     db.session.commit()
+    invalidate_access(student.id)
     return jsonify({"message": message, "is_active": student.is_active}), 200
 
 @bp.route("/sessions", methods=["GET"])
@@ -335,33 +491,46 @@ def get_student_courses():
     if student.role != "student":
         return jsonify({"error": "Only students can access this endpoint"}), 403
 
-    enrollments = Enrollment.query.filter_by(user_id=user_id).all()
+    # Course metadata comes with the enrollments in the same query
+    enrollments = [
+        e for e in Enrollment.query.options(joinedload(Enrollment.course)).filter_by(user_id=user_id).all()
+        if e.course
+    ]
+
+    total_lessons = total_lessons_for([e.course for e in enrollments])
+    # Enrollments without built counters are counted together in one grouped query
+    completed_counts = completed_counts_for(
+        user_id, [e.course_id for e in enrollments if e.completed_lessons is None]
+    )
 
     enrolled_courses = []
     paid_not_enrolled = []
 
     for e in enrollments:
-        if not e.course:
-            continue
-
         course = e.course
+        total = total_lessons[course.id]
 
-        # ✅ CALCULATE REAL PROGRESS HERE
-        progress_data = calculate_progress(course, user_id)
+        # ✅ Precomputed counters, grouped count until they are built
+        if e.completed_lessons is not None:
+            completed = e.completed_lessons
+            percentage = round(e.progress or 0, 2)
+        else:
+            completed = completed_counts.get(course.id, 0)
+            percentage = round((completed / total) * 100, 2) if total > 0 else 0
 
         data = {
             "course_id": course.id,
             "title": course.title,
             "slug": course.slug,
             "image": course.image,
-            "total_lessons": course.total_lessons,
             "enrolled_at": e.enrolled_at.isoformat() if e.enrolled_at else None,
             "status": e.status,
 
             # FRACTION-STYLE PROGRESS
-            "progress": f"{progress_data['completed_lessons']}",
-            "completed_lessons": progress_data["completed_lessons"],
-            "total_lessons": progress_data["total_lessons"]
+            "progress": f"{completed}",
+            "completed_lessons": completed,
+            "total_lessons": total,
+            "percentage": percentage
         }
 
         if e.status == "active":
@@ -379,52 +548,6 @@ def get_student_courses():
         }
     }), 200
 
-def calculate_progress(course, user_id):
-    total_lessons = 0
-    completed_lessons = 0
-    completed_lesson_ids = []
-
-    section_progress_list = []
-
-    for section in course.sections:
-        sec_total = len(section.lessons)
-        sec_completed = 0
-
-        for lesson in section.lessons:
-            total_lessons += 1
-
-            progress = Progress.query.filter_by(
-                user_id=user_id,
-                lesson_id=lesson.id,
-                is_completed=True
-            ).first()
-
-            if progress:
-                completed_lessons += 1
-                sec_completed += 1
-                completed_lesson_ids.append(lesson.id)
-
-        section_progress_list.append({
-            "section_id": section.id,
-            "section_name": section.name,
-            "completed": sec_completed,
-            "total": sec_total,
-            "percentage": round((sec_completed / sec_total) * 100, 2) if sec_total > 0 else 0
-        })
-
-    overall_percentage = (
-        round((completed_lessons / total_lessons) * 100, 2)
-        if total_lessons > 0 else 0
-    )
-
-    return {
-        "completed_lessons": completed_lessons,
-        "completed_lesson_ids": completed_lesson_ids,
-        "total_lessons": total_lessons,
-        "overall_percentage": overall_percentage,
-        "sections": section_progress_list
-    }
-
 @bp.route("/courses/<int:course_id>/full", methods=["GET"])
 @jwt_required()
 def get_student_full_course(course_id):
@@ -438,7 +561,9 @@ def get_student_full_course(course_id):
     if student.role != "student":
         return jsonify({"error": "Only students can access full course content"}), 403
 
-    course = Course.query.get_or_404(course_id)
+    outline = get_course_outline(course_id)
+    if outline is None:
+        abort(404)
 
     # Check active enrollment
     enrollment = Enrollment.query.filter_by(
@@ -453,20 +578,23 @@ def get_student_full_course(course_id):
         }), 403
 
     # ---- Calculate Progress ----
-    progress_data = calculate_progress(course, user_id)
+    completions = completion_map(user_id, course_id)
+    progress_data = summarize_progress(outline, completions)
 
     # ---- Build deep course structure ----
+    course = outline["course"]
     course_data = {
-        "id": course.id,
-        "title": course.title,
-        "slug": course.slug,
-        "description": course.description,
-        "long_description": course.long_description,
-        "price": course.price,
-        "is_published": course.is_published,
-        "total_lessons": course.total_lessons,
-        "created_at": course.created_at.isoformat(),
-        "image": course.image,
+        "id": course["id"],
+        "title": course["title"],
+        "slug": course["slug"],
+        "description": course["description"],
+        "long_description": course["long_description"],
+        "price": course["price"],
+        "is_published": course["is_published"],
+        "total_lessons": course["total_lessons"],
+        "total_duration": course["total_duration"],
+        "created_at": course["created_at"],
+        "image": course["image"],
 
         # Include updated progress summary
         "progress": progress_data,
@@ -474,49 +602,45 @@ def get_student_full_course(course_id):
         "sections": []
     }
 
-    for section in course.sections:
+    for section in outline["sections"]:
         section_data = {
-            "id": section.id,
-            "name": section.name,
-            "slug": section.slug,
-            "description": section.description,
+            "id": section["id"],
+            "name": section["name"],
+            "slug": section["slug"],
+            "description": section["description"],
             "lessons": []
         }
 
-        for lesson in section.lessons:
+        for lesson in section["lessons"]:
             # check if student completed this lesson
-            progress = Progress.query.filter_by(
-                user_id=user_id,
-                lesson_id=lesson.id,
-                is_completed=True
-            ).first()
+            completed_at = completions.get(lesson["id"])
+            is_completed = lesson["id"] in completions
 
             lesson_data = {
-                "id": lesson.id,
-                "title": lesson.title,
-                "slug": lesson.slug,
-                "notes": lesson.notes,
-                "reference_link": lesson.reference_link,
-                "video_url": lesson.video_url,
-                "document_url": lesson.document_url,
-                "duration": lesson.duration,
-                "size": lesson.size,
-                "created_at": lesson.created_at.isoformat(),
-                "is_completed": bool(progress),
-                "completed_at": progress.completed_at.isoformat() if progress else None,
+                "id": lesson["id"],
+                "title": lesson["title"],
+                "slug": lesson["slug"],
+                "notes": lesson["notes"],
+                "reference_link": lesson["reference_link"],
+                "video_url": lesson["media"]["video_url"],
+                "document_url": lesson["media"]["document_url"],
+                "duration": lesson["duration"],
+                "size": lesson["size"],
+                "created_at": lesson["created_at"],
+                "is_completed": is_completed,
+                "completed_at": completed_at.isoformat() if completed_at else None,
                 "quizzes": []
             }
 
             # include lesson quizzes
-            if hasattr(lesson, "quizzes"):
-                for quiz in lesson.quizzes:
-                    lesson_data["quizzes"].append({
-                        "id": quiz.id,
-                        "question": quiz.question,
-                        "options": quiz.options,
-                        "correct_answer": quiz.correct_answer,
-                        "explanation": quiz.explanation
-                    })
+            for quiz in lesson["quizzes"]:
+                lesson_data["quizzes"].append({
+                    "id": quiz["id"],
+                    "question": quiz["question"],
+                    "options": quiz["options"],
+                    "correct_answer": quiz["correct_answer"],
+                    "explanation": quiz["explanation"]
+                })
 
             section_data["lessons"].append(lesson_data)
 
@@ -0,0 +1,238 @@
+"""
+In-process Cache Utilities
+LRU + TTL cache with negative caching, hit/miss counters and an optional
+SQLite file shared by every gunicorn worker on the host
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+# name -> TTLCache, used for stats reporting
+_registry = {}
+
+# Shared backing store, configured by init_cache(app)
+_shared_store = None
+
+
+class SQLiteStore:
+    """Key-value store in a local SQLite file (values are JSON encoded)"""
+
+    def __init__(self, path, table="cache_entries"):
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        # One connection per thread per process (connections must not cross a fork)
+        pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != pid:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = pid
+        return conn
+
+    def get(self, key):
+        """Return (value, expires_at) or None if missing/expired"""
+        row = self._connect().execute(
+            f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        self._connect().execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), expires_at)
+        )
+
+    def delete(self, key):
+        self._connect().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def delete_prefix(self, prefix):
+        self._connect().execute(
+            f"DELETE FROM {self.table} WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+        )
+
+    def purge_expired(self):
+        self._connect().execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry expiry
+
+    Args:
+        name: Unique cache name (used for stats and shared-store keys)
+        maxsize: Max entries kept in this process
+        ttl: Seconds a value stays fresh
+        negative_ttl: Seconds a "negative" value stays fresh (defaults to ttl)
+        is_negative: Callable telling whether a value is a failed lookup
+        shared: Also read/write the shared SQLite store when one is configured
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=300, negative_ttl=None, is_negative=None, shared=False):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.is_negative = is_negative
+        self.shared = shared
+
+        self._data = OrderedDict()  # key -> (value, expires_at, negative)
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "shared_hits": 0,
+            "shared_errors": 0,
+            "evictions": 0,
+        }
+
+        _registry[name] = self
+
+    def _shared_key(self, key):
+        return f"{self.name}:{key}"
+
+    def _store_local(self, key, value, expires_at, negative):
+        with self._lock:
+            self._data[key] = (value, expires_at, negative)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def get(self, key, default=None):
+        now = time.time()
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at, negative = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self._counters["hits"] += 1
+                    if negative:
+                        self._counters["negative_hits"] += 1
+                    return value
+                del self._data[key]
+
+        store = _shared_store if self.shared else None
+        if store is not None:
+            try:
+                found = store.get(self._shared_key(key))
+            except sqlite3.Error:
+                found = None
+                self._counters["shared_errors"] += 1
+
+            if found is not None:
+                value, expires_at = found
+                negative = bool(self.is_negative and self.is_negative(value))
+                self._store_local(key, value, expires_at, negative)
+                with self._lock:
+                    self._counters["hits"] += 1
+                    self._counters["shared_hits"] += 1
+                    if negative:
+                        self._counters["negative_hits"] += 1
+                return value
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        negative = bool(self.is_negative and self.is_negative(value))
+        if ttl is None:
+            ttl = self.negative_ttl if negative else self.ttl
+        expires_at = time.time() + ttl
+
+        self._store_local(key, value, expires_at, negative)
+
+        store = _shared_store if self.shared else None
+        if store is not None:
+            try:
+                store.set(self._shared_key(key), value, expires_at)
+            except sqlite3.Error:
+                self._counters["shared_errors"] += 1
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+        store = _shared_store if self.shared else None
+        if store is not None:
+            try:
+                store.delete(self._shared_key(key))
+            except sqlite3.Error:
+                self._counters["shared_errors"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+        store = _shared_store if self.shared else None
+        if store is not None:
+            try:
+                store.delete_prefix(self._shared_key(""))
+            except sqlite3.Error:
+                self._counters["shared_errors"] += 1
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._data)
+
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "negative_ttl": self.negative_ttl,
+            "shared": bool(self.shared and _shared_store is not None),
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None,
+        }
+
+
+def cache_stats():
+    """Stats for every registered cache, keyed by cache name"""
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+
+def init_cache(app):
+    """Attach the shared SQLite store when CACHE_SHARED_PATH is configured"""
+    global _shared_store
+
+    path = app.config.get("CACHE_SHARED_PATH")
+    if not path:
+        return
+
+    try:
+        _shared_store = SQLiteStore(path)
+        _shared_store.purge_expired()
+    except sqlite3.Error as e:
+        print(f"⚠️ Shared cache disabled ({path}): {e}")
+        _shared_store = None
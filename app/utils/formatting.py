@@ -0,0 +1,18 @@
+def format_duration(seconds):
+    """Convert float seconds to HH:MM:SS string."""
+    if not seconds:
+        return "00:00:00"
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f"{hours:02}:{minutes:02}:{secs:02}"
+
+def format_size(bytes_size):
+    """Convert bytes to human-readable GB/MB/KB."""
+    if not bytes_size:
+        return "0 KB"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if bytes_size < 1024.0:
+            return f"{bytes_size:.2f} {unit}"
+        bytes_size /= 1024.0
+    return f"{bytes_size:.2f} TB"
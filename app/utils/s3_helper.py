@@ -5,10 +5,12 @@ Handles file uploads, downloads, and presigned URL generation for S3
 
 import boto3
 import os
+import time
 import uuid
 from botocore.exceptions import ClientError
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
+from app.utils.cache import TTLCache
 
 # Load environment variables
 load_dotenv()
@@ -22,6 +24,10 @@ AWS_S3_BUCKET_NAME = os.getenv('AWS_S3_BUCKET_NAME')
 # Optional CloudFront domain for faster delivery
 AWS_CLOUDFRONT_DOMAIN = os.getenv('AWS_CLOUDFRONT_DOMAIN', None)
 
+# Presigned GET URLs are reused for every request in the same time window so
+# browsers/CDNs can cache the media behind them (0 disables bucketing)
+S3_PRESIGN_BUCKET_SECONDS = int(os.getenv('S3_PRESIGN_BUCKET_SECONDS', 900))
+
 
 class S3Helper:
     """Helper class for S3 operations"""
@@ -36,6 +42,9 @@ class S3Helper:
         )
         self.bucket_name = AWS_S3_BUCKET_NAME
         self.cloudfront_domain = AWS_CLOUDFRONT_DOMAIN
+
+        # (file_key, expiration, bucket) -> signed URL, shared across workers when configured
+        self._presigned_urls = TTLCache("s3_presigned_url", maxsize=4096, ttl=S3_PRESIGN_BUCKET_SECONDS, shared=True)
     
     def upload_file(self, file_obj, folder='videos', filename=None):
         """
@@ -110,18 +119,42 @@ class S3Helper:
                 'error': str(e)
             }
     
-    def generate_presigned_url(self, file_key, expiration=3600):
+    def generate_presigned_url(self, file_key, expiration=3600, bucket_seconds=None):
         """
         Generate a presigned URL for secure file access
         Users can access the file using this URL for a limited time
+
+        Requests in the same time bucket get the same URL, which is signed for
+        expiration + bucket_seconds so it stays valid for at least `expiration`
+        seconds after any of them.
         
         Args:
             file_key: S3 object key (e.g., 'videos/abc123.mp4')
             expiration: URL expiration time in seconds (default: 1 hour)
+            bucket_seconds: Reuse window (default: S3_PRESIGN_BUCKET_SECONDS, 0 disables)
         
         Returns:
             str: Presigned URL or None if error
         """
+        if bucket_seconds is None:
+            bucket_seconds = S3_PRESIGN_BUCKET_SECONDS
+
+        if bucket_seconds <= 0:
+            return self._sign_get_url(file_key, expiration)
+
+        now = time.time()
+        bucket = int(now // bucket_seconds)
+        cache_key = f"{file_key}|{expiration}|{bucket}"
+
+        url = self._presigned_urls.get(cache_key)
+        if url is None:
+            url = self._sign_get_url(file_key, expiration + bucket_seconds)
+            if url:
+                # keep it only until the bucket rolls over
+                self._presigned_urls.set(cache_key, url, ttl=(bucket + 1) * bucket_seconds - now)
+        return url
+
+    def _sign_get_url(self, file_key, expiration):
         try:
             # If using CloudFront, generate CloudFront signed URL
             # For simplicity, we'll use S3 presigned URLs
@@ -250,9 +283,9 @@ def upload_to_s3(file_obj, folder='videos', filename=None):
     return s3_helper.upload_file(file_obj, folder, filename)
 
 
-def generate_presigned_url(file_key, expiration=3600):
+def generate_presigned_url(file_key, expiration=3600, bucket_seconds=None):
     """Generate presigned URL for file access"""
-    return s3_helper.generate_presigned_url(file_key, expiration)
+    return s3_helper.generate_presigned_url(file_key, expiration, bucket_seconds)
 
 
 def delete_from_s3(file_key):
@@ -0,0 +1,106 @@
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Config reads the database URL at import time
+_db_file = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_db_file.name}"
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import User, Course, Lesson  # noqa: E402
+from app.models.course import Section  # noqa: E402
+from app.models.progress import LessonCompletionBitmap, LessonPosition  # noqa: E402
+from app.helpers.position_buffer import PositionBuffer  # noqa: E402
+
+
+@event.listens_for(Engine, "connect")
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores FKs by default; production (InnoDB) does not
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def student(app):
+    user = User(full_name="Stu Dent", email="student@example.com", role="student")
+    user.set_password("secret")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def lesson(app):
+    course = Course(title="Course", slug="course", description="d", price=0, is_published=True)
+    db.session.add(course)
+    db.session.commit()
+    section = Section(name="Section", slug="section", description="d", course_id=course.id)
+    db.session.add(section)
+    db.session.commit()
+    lesson = Lesson(title="Lesson", slug="lesson", section_id=section.id)
+    db.session.add(lesson)
+    db.session.commit()
+    return lesson
+
+
+def _delete_account(app, user):
+    token = create_access_token(identity=str(user.id), additional_claims={"role": user.role})
+    return app.test_client().delete(
+        "/delete-account",
+        json={"password": "secret"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+
+def test_delete_account_with_completion_bitmap(app, student, lesson):
+    course_id = lesson.section.course_id
+    db.session.add(LessonCompletionBitmap(user_id=student.id, course_id=course_id, bitmap=b"\x01"))
+    db.session.commit()
+    user_id = student.id
+
+    response = _delete_account(app, student)
+
+    assert response.status_code == 200
+    assert db.session.get(User, user_id) is None
+    assert LessonCompletionBitmap.query.filter_by(user_id=user_id).count() == 0
+
+
+def test_delete_account_with_resume_positions(app, student, lesson):
+    db.session.add(LessonPosition(user_id=student.id, lesson_id=lesson.id, position=42.0))
+    db.session.commit()
+    user_id = student.id
+
+    response = _delete_account(app, student)
+
+    assert response.status_code == 200
+    assert LessonPosition.query.filter_by(user_id=user_id).count() == 0
+
+
+def test_buffered_position_flushed_after_account_deletion(app, student, lesson):
+    buffer = PositionBuffer()
+    buffer._entries[(student.id, lesson.id)] = (42.0, None, datetime.utcnow())
+    user_id = student.id
+
+    assert _delete_account(app, student).status_code == 200
+
+    assert buffer.flush() == 0
+    assert LessonPosition.query.filter_by(user_id=user_id).count() == 0